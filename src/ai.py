@@ -1,46 +1,384 @@
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 import asyncio
-from src.utils import ModelType
+import os
+import time
+import httpx
+import numpy as np
+from src.utils import ModelType, estimate_tokens
+from src.cache import SQLiteCache, make_key
+from src.embedding_store import EmbeddingStore
+from src.scheduler import Scheduler
+from src.single_flight import SingleFlight
+from src.usage import UsageTracker
+from src.config import (
+    OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS, OPENAI_KEEPALIVE_EXPIRY,
+    CACHE_DIR, LLM_CACHE_ENABLED, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL,
+    EMBEDDING_MODEL, EMBEDDING_MAX_INPUTS_PER_REQUEST, EMBEDDING_MAX_TOKENS_PER_REQUEST,
+    EMBEDDING_STORE_ENABLED, EMBEDDING_STORE_MAX_ENTRIES,
+    MODEL_RATE_LIMITS, DEFAULT_RATE_LIMIT, LLM_INITIAL_CONCURRENCY, LLM_MIN_CONCURRENCY, LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_CAP, LLM_COMPLETION_TOKEN_ESTIMATE,
+)
 
 
+class AIResponseError(Exception):
+    """
+    Raised when the API could not produce a response, even after retries.
+    """
+
 
-async def get_ai_responses(*, messages, model):
+class ClientManager:
+    """
+    Process-wide owner of the AsyncOpenAI client.
+
+    A single client (and therefore a single HTTP connection pool) is shared by every
+    call in a run, so keep-alive connections are reused instead of paying a new TLS
+    handshake for each request. The manager also counts how many requests went out
+    on a freshly opened connection versus a reused one.
+    """
+
+    def __init__(self, max_connections=OPENAI_MAX_CONNECTIONS,
+                 max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                 keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client = None
+        self.requests = 0
+        self.new_connections = 0
+
+    async def _on_request(self, request):
+        # httpcore reports connection events through the "trace" request extension.
+        self.requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    def get_client(self):
+        """
+        Return the shared AsyncOpenAI client, creating it on first use.
+        """
+        if self._client is None:
+            http_client = DefaultAsyncHttpxClient(
+                limits=self.limits,
+                event_hooks={"request": [self._on_request]},
+            )
+            # Retries are handled by the scheduler so that they respect its rate limits.
+            self._client = AsyncOpenAI(http_client=http_client, max_retries=0)
+        return self._client
+
+    def stats(self):
+        """
+        Return connection reuse counters for the current run.
+        """
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": max(self.requests - self.new_connections, 0),
+        }
+
+    async def aclose(self):
+        """
+        Close the shared client and its connection pool.
+        """
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+client_manager = ClientManager()
+
+
+scheduler = Scheduler(
+    rate_limits=MODEL_RATE_LIMITS,
+    default_rate_limit=DEFAULT_RATE_LIMIT,
+    initial_concurrency=LLM_INITIAL_CONCURRENCY,
+    min_concurrency=LLM_MIN_CONCURRENCY,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    max_retries=LLM_MAX_RETRIES,
+    backoff_base=LLM_BACKOFF_BASE,
+    backoff_cap=LLM_BACKOFF_CAP,
+)
+
+
+usage_tracker = UsageTracker()
+
+# Concurrent identical requests share one underlying API call.
+llm_flights = SingleFlight("chat completions")
+# Keyed per (model, text): a text being embedded by one batch is not requested again by another.
+embedding_flights = SingleFlight("embeddings")
+
+
+def get_client():
+    return client_manager.get_client()
+
+
+def usage_tokens(response):
+    usage = getattr(response, "usage", None)
+    return usage.total_tokens if usage is not None else None
+
+
+def estimate_message_tokens(messages):
+    return sum(estimate_tokens(message.get("content") or "") for message in messages)
+
+
+async def close_clients():
+    await client_manager.aclose()
+    response_cache.close()
+    for store in embedding_stores.values():
+        store.compact(EMBEDDING_STORE_MAX_ENTRIES)
+        store.close()
+
+
+response_cache = SQLiteCache(os.path.join(CACHE_DIR, "llm_responses.sqlite"), max_bytes=LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL)
+
+# Sampling parameters per model. Models sampled at temperature 0 are deterministic
+# and their responses are cached by default.
+MODEL_PARAMS = {
+    ModelType.REASONING: {},
+    ModelType.SUMMARIZING: {"temperature": 0},
+    ModelType.DRAFTING: {"temperature": 0},
+}
+CACHEABLE_MODELS = {ModelType.SUMMARIZING, ModelType.DRAFTING}
+
+
+async def get_ai_responses(*, messages, model, cache=None, tag=None):
     """
     Call OpenAI's API to get an assistant response using the provided messages.
-    
+
     Parameters:
         messages (list): A list of message dictionaries for the conversation.
         model: The model to use for generating a response (expected to have 'value' and 'name' attributes).
-        
+        cache (bool): Whether to serve and store the reply in the response cache.
+            Defaults to caching deterministic models only.
+        tag (str): The call site, used to aggregate usage (e.g. "crawl-summary", "section").
+
     Returns:
-        str: The assistant's reply, or an error message if something goes wrong.
+        str: The assistant's reply.
+
+    Raises:
+        ValueError: If the model type is not supported.
+        AIResponseError: If no response could be obtained after retries.
     """
+    if model not in MODEL_PARAMS:
+        raise ValueError(f"Invalid model type: {model}")
+    params = MODEL_PARAMS[model]
+    if cache is None:
+        cache = LLM_CACHE_ENABLED and model in CACHEABLE_MODELS
+    key = make_key(model.value, messages, params)
+    if cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            usage_tracker.record(model.value, None, tag=tag, cache_hit=True)
+            return cached
+    return await llm_flights.do(key, lambda: _complete(messages, model, params, key if cache else None, tag))
+
+
+async def _complete(messages, model, params, cache_key, tag):
+    client = get_client()
+    started = time.monotonic()
     try:
-        client = AsyncOpenAI()
-        if model == ModelType.REASONING:
-            response = await client.chat.completions.create(
-                model= model.value,
-                messages=messages
-            )
-        elif model == ModelType.SUMMARIZING or model == ModelType.DRAFTING:
-            response = await client.chat.completions.create(
-                model=model.value,
-                messages=messages,
-                temperature=0
-            )
-        else:
-            print("Invalid model type.")
-            return "Sorry, I couldn't generate a response."
-        reply = response.choices[0].message.content.strip()
-        return reply
+        response = await scheduler.run(
+            model.value,
+            estimate_message_tokens(messages) + LLM_COMPLETION_TOKEN_ESTIMATE,
+            lambda: client.chat.completions.create(model=model.value, messages=messages, **params),
+            usage_tokens=usage_tokens,
+        )
+    except Exception as e:
+        raise AIResponseError(f"Error communicating with OpenAI ({model.value}): {e}") from e
+    usage_tracker.record(model.value, response.usage, tag=tag, latency=time.monotonic() - started)
+    reply = (response.choices[0].message.content or "").strip()
+    if cache_key:
+        response_cache.set(cache_key, reply)
+    return reply
+
+
+async def stream_ai_responses(*, messages, model, cache=None, tag=None):
+    """
+    Stream an assistant response token by token.
+
+    Parameters:
+        messages (list): A list of message dictionaries for the conversation.
+        model: The model to use for generating a response.
+        cache (bool): Whether to serve and store the reply in the response cache.
+            Defaults to caching deterministic models only.
+        tag (str): The call site, used to aggregate usage.
+
+    Yields:
+        str: Pieces of the reply as they arrive. A cached reply is yielded in one piece.
+
+    Raises:
+        ValueError: If the model type is not supported.
+        AIResponseError: If the stream could not be opened after retries or broke off.
+    """
+    if model not in MODEL_PARAMS:
+        raise ValueError(f"Invalid model type: {model}")
+    params = MODEL_PARAMS[model]
+    if cache is None:
+        cache = LLM_CACHE_ENABLED and model in CACHEABLE_MODELS
+    key = make_key(model.value, messages, params) if cache else None
+    if cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            usage_tracker.record(model.value, None, tag=tag, cache_hit=True)
+            yield cached
+            return
+    client = get_client()
+    started = time.monotonic()
+    usage = None
+    try:
+        # The scheduler covers opening the stream; retries are only safe before any token was received.
+        stream = await scheduler.run(
+            model.value,
+            estimate_message_tokens(messages) + LLM_COMPLETION_TOKEN_ESTIMATE,
+            lambda: client.chat.completions.create(
+                model=model.value, messages=messages, stream=True,
+                stream_options={"include_usage": True}, **params
+            ),
+        )
     except Exception as e:
-        print(f"Error communicating with OpenAI: {e}")
-        return "Sorry, I couldn't generate a response."
-
-async def get_embbded_text(text):
-    client = AsyncOpenAI()
-    response = await client.embeddings.create(
-    input=text,
-    model="text-embedding-3-small"
-    )
-    return response.data[0].embedding
\ No newline at end of file
+        raise AIResponseError(f"Error communicating with OpenAI ({model.value}): {e}") from e
+    pieces = []
+    try:
+        async for chunk in stream:
+            # With include_usage the final chunk carries the usage and no choices.
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            piece = chunk.choices[0].delta.content
+            if piece:
+                pieces.append(piece)
+                yield piece
+    except Exception as e:
+        raise AIResponseError(f"OpenAI stream interrupted ({model.value}): {e}") from e
+    usage_tracker.record(model.value, usage, tag=tag, latency=time.monotonic() - started)
+    if cache:
+        response_cache.set(key, "".join(pieces).strip())
+
+
+def embedding_batches(texts, max_inputs=EMBEDDING_MAX_INPUTS_PER_REQUEST, max_tokens=EMBEDDING_MAX_TOKENS_PER_REQUEST):
+    """
+    Split texts into batches of (start, end) index ranges that respect the provider's
+    per-request input count and token limits.
+    """
+    batches = []
+    start = 0
+    tokens = 0
+    for i, text in enumerate(texts):
+        text_tokens = estimate_tokens(text)
+        if i > start and (i - start >= max_inputs or tokens + text_tokens > max_tokens):
+            batches.append((start, i))
+            start = i
+            tokens = 0
+        tokens += text_tokens
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+embedding_stores = {}
+
+
+def get_embedding_store(model):
+    """
+    Return the on-disk embedding store for a model, creating it on first use.
+    """
+    if model not in embedding_stores:
+        directory = os.path.join(CACHE_DIR, "embeddings", model.replace("/", "_"))
+        embedding_stores[model] = EmbeddingStore(directory, model)
+    return embedding_stores[model]
+
+
+async def get_embeddings(texts, model=EMBEDDING_MODEL, tag=None):
+    """
+    Embed a list of texts with as few API requests as possible. Texts already in
+    the embedding store are served from disk without an API call.
+
+    Parameters:
+        texts (list): The texts to embed.
+        model (str): The embedding model name.
+        tag (str): The call site, used to aggregate usage.
+
+    Returns:
+        np.ndarray: A float32 matrix with one row per input text, in input order.
+
+    Raises:
+        AIResponseError: If the embeddings could not be obtained after retries.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    # The API rejects empty strings.
+    inputs = [text if text.strip() else " " for text in texts]
+    # Embed each distinct text once and expand back to input order.
+    unique_inputs = list(dict.fromkeys(inputs))
+    if len(unique_inputs) < len(inputs):
+        positions = {text: i for i, text in enumerate(unique_inputs)}
+        embeddings = await get_embeddings(unique_inputs, model, tag=tag)
+        return embeddings[[positions[text] for text in inputs]]
+    if not EMBEDDING_STORE_ENABLED:
+        return await embed_shared(inputs, model, tag)
+    store = get_embedding_store(model)
+    rows, stored = store.lookup(inputs)
+    found = [i for i, row in enumerate(rows) if row >= 0]
+    missing = [i for i, row in enumerate(rows) if row < 0]
+    if not missing:
+        return stored
+    fresh = await embed_shared([inputs[i] for i in missing], model, tag)
+    if not found:
+        return fresh
+    result = np.empty((len(inputs), fresh.shape[1]), dtype=np.float32)
+    result[found] = stored
+    result[missing] = fresh
+    return result
+
+
+async def embed_shared(inputs, model, tag=None):
+    """
+    Embed inputs through embedding_flights, so that texts a concurrent call is
+    already embedding are waited for instead of requested again. New embeddings
+    are added to the embedding store before the waiting callers resume.
+    """
+    async def embed(keys):
+        texts = [text for _, text in keys]
+        embeddings = await embed_texts(texts, model, tag)
+        if EMBEDDING_STORE_ENABLED:
+            get_embedding_store(model).add(texts, embeddings)
+        return list(embeddings)
+
+    rows = await embedding_flights.do_many([(model, text) for text in inputs], embed)
+    return np.array(rows, dtype=np.float32)
+
+
+async def embed_texts(inputs, model, tag=None):
+    """
+    Request embeddings for inputs from the API in batches.
+    """
+    client = get_client()
+
+    async def embed_batch(start, end):
+        batch = inputs[start:end]
+        started = time.monotonic()
+        try:
+            response = await scheduler.run(
+                model,
+                sum(estimate_tokens(text) for text in batch),
+                lambda: client.embeddings.create(input=batch, model=model),
+                usage_tokens=usage_tokens,
+            )
+        except Exception as e:
+            raise AIResponseError(f"Error communicating with OpenAI ({model}): {e}") from e
+        usage_tracker.record(model, response.usage, tag=tag, latency=time.monotonic() - started)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    batches = embedding_batches(inputs)
+    results = await asyncio.gather(*(embed_batch(start, end) for start, end in batches))
+    return np.array([embedding for batch in results for embedding in batch], dtype=np.float32)
+
+
+async def get_embbded_text(text, tag=None):
+    embeddings = await get_embeddings([text], tag=tag)
+    return embeddings[0].tolist()
@@ -1,4 +1,4 @@
-
+from src.urls import canonicalize_url
 
 async def blocks_to_references(blocks, urls, references):
     """
@@ -16,7 +16,8 @@ async def blocks_to_references(blocks, urls, references):
                           from successful crawl results.
     """
     # Build a lookup dictionary mapping URLs to their successful crawl results.
-    url_to_reference = {ref["url"]: ref for ref in references if ref.get("success")}
+    # Keyed by canonical URL, so that a block's URL variant finds the crawl of the variant that was kept.
+    url_to_reference = {canonicalize_url(ref["url"]): ref for ref in references if ref.get("success")}
 
     # Initialize list to store the final result of blocks with associated references.
     blocks_with_references = []
@@ -27,11 +28,12 @@ async def blocks_to_references(blocks, urls, references):
         block_references = []
         # For each URL related to the current block, check if there is a successful crawl result.
         for url in block_urls:
-            if url in url_to_reference:
+            key = canonicalize_url(url)
+            if key in url_to_reference:
                 # Append the reference data with URL and its summary.
                 block_references.append({
                     "url": url,
-                    "summary": url_to_reference[url].get("summary", "")  # Default to empty string if summary is missing.
+                    "summary": url_to_reference[key].get("summary", "")  # Default to empty string if summary is missing.
                 })
         # Append the block along with its gathered references to the result list.
         blocks_with_references.append({
@@ -1,6 +1,7 @@
 # Import the required functions from the serp module and the asyncio library for asynchronous processing.
 from src.serp import generate_serp_queries, search_serp
 from src.prompts import generate_serp_evidence
+from src.utils import unique_urls
 import asyncio
 
 # Asynchronously processes a single block of text.
@@ -16,12 +17,8 @@ async def process_block(block):
     query_tasks = [search_serp(query) for query in queries]
     # Execute all search tasks concurrently and collect the results.
     query_results = await asyncio.gather(*query_tasks)
-    # Flatten the list of URL lists from each query result.
-    urls = []
-    for result in query_results:
-        urls.extend(result)
-    # Remove duplicates by converting the list to a set, then back to a list.
-    return list(set(urls))
+    # Flatten the URL lists of the queries, removing variants of the same page.
+    return unique_urls(query_results)
 
 # Asynchronously processes multiple text blocks.
 # Each block is processed via the process_block function to fetch URLs,
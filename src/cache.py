@@ -0,0 +1,160 @@
+"""
+Persistent key-value caches for My ResearchPal.
+Entries live in a local SQLite file, expire after a TTL and are evicted
+least-recently-used first once the cache grows past its size bound.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+
+def make_key(*parts):
+    """
+    Build a content-addressed cache key from JSON-serializable parts.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteCache:
+    """
+    A size-bounded LRU cache with TTL stored in a SQLite database.
+
+    Parameters:
+        path (str): Location of the SQLite file (its directory is created on demand).
+        max_bytes (int): Upper bound for the total size of stored values.
+        ttl (float): Seconds after which an entry is considered expired (None disables expiry).
+    """
+
+    def __init__(self, path, max_bytes, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._conn = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON entries (accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None on a miss or an expired entry.
+        """
+        conn = self._connect()
+        row = conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None:
+            self.misses += 1
+            return None
+        value, created_at = row
+        if self.ttl is not None and now - created_at > self.ttl:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.commit()
+            self.expired += 1
+            self.misses += 1
+            return None
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        conn.commit()
+        self.hits += 1
+        return json.loads(value)
+
+    def get_stale(self, key, max_stale=None):
+        """
+        Like get, but also return expired entries so the caller can serve them while refreshing.
+
+        Parameters:
+            key (str): The cache key.
+            max_stale (float): Seconds past the TTL after which an expired entry is no longer served.
+
+        Returns:
+            tuple: (value, is_stale), or (None, False) on a miss.
+        """
+        conn = self._connect()
+        row = conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None:
+            self.misses += 1
+            return None, False
+        value, created_at = row
+        age = now - created_at
+        is_stale = self.ttl is not None and age > self.ttl
+        if is_stale and max_stale is not None and age > self.ttl + max_stale:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.commit()
+            self.expired += 1
+            self.misses += 1
+            return None, False
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        conn.commit()
+        if is_stale:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return json.loads(value), is_stale
+
+    def set(self, key, value):
+        """
+        Store a JSON-serializable value under key and evict old entries if needed.
+        """
+        conn = self._connect()
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, data, size, now, now),
+        )
+        self.writes += 1
+        self._evict(conn)
+        conn.commit()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        """
+        Return hit/miss counters for the current run.
+        """
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,45 @@
+"""
+Checkpoints of a research run.
+Each stage writes its state as JSON into the run directory, so that a run
+interrupted after research, the table of contents, drafting or annotation
+can be resumed with `--resume <run-dir>` without repeating completed work.
+"""
+
+import json
+import os
+
+
+class Checkpoint:
+    """
+    JSON state files in one run directory.
+
+    Parameters:
+        run_dir (str): Directory holding the state files; created if missing.
+    """
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        os.makedirs(run_dir, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.run_dir, f"{name}.json")
+
+    def load(self, name):
+        """
+        Return the saved state called name, or None if it was never saved.
+        """
+        try:
+            with open(self._path(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, name, state):
+        """
+        Save state under name. The file is replaced atomically, so a crash mid-write keeps the previous checkpoint.
+        """
+        path = self._path(name)
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(temporary, path)
@@ -10,13 +10,136 @@ MAX_SERP_EVIDENCE =3
 
 SEARCH_PER_SERP = 10
 
-# Research recursion depth
-RESEARCH_DEPTH = 2
+# Search backend settings
+SEARCH_BACKEND = "google"  # "google" for web search, "local" for the offline LOCAL_CORPUS_DIR index
+SEARCH_REGION = "us"
+SEARCH_THREAD_POOL_SIZE = 4  # threads shared by blocking search backends
+SEARCH_MAX_CONCURRENCY = 2  # concurrent searches per backend
+SEARCH_MIN_INTERVAL = 1.0  # seconds between the start of two searches on a backend
+
+# Research frontier
+RESEARCH_DEPTH = 2  # deepest level follow-up queries are generated for
+RESEARCH_WORKERS = 4  # queries explored concurrently
+RESEARCH_MAX_QUERIES = 20  # search queries per run
+RESEARCH_MAX_PAGES = 150  # pages crawled per run
+RESEARCH_QUERIES_PER_BRANCH = 3  # follow-up queries generated from one query's learnings
+RESEARCH_CRAWL_QUORUM = 0.7  # share of a query's URLs that must be summarized before moving on
+RESEARCH_CRAWL_DEADLINE = 90.0  # seconds after which a query moves on with the pages it has
+RESEARCH_NOVELTY_ENABLED = True  # follow branches by how much their new summaries add to what is known
+RESEARCH_NOVELTY_STOP = 0.12  # branches whose new summaries are less novel than this are not followed up
+RESEARCH_NOVELTY_EXTEND = 0.3  # branches at least this novel keep being followed up past RESEARCH_DEPTH
+RESEARCH_MAX_EXTENDED_DEPTH = 4  # deepest level follow-up queries of novel branches are generated for
 
 # Crawler settings
 CRAWL_DEPTH = 0
 MAX_PAGES_PER_URL = 25
 
+# Crawl politeness
+CRAWL_MAX_CONCURRENCY = 10  # pages fetched at once across all domains
+CRAWL_PER_DOMAIN_CONCURRENCY = 2  # pages fetched at once from one domain
+CRAWL_PER_DOMAIN_DELAY = 1.0  # seconds between fetch starts on one domain
+
+# Page summarization
+SUMMARY_CHUNK_TOKENS = 24000  # pages up to this size are summarized in one call, larger ones map-reduced in chunks
+SUMMARY_PAGE_TOKEN_BUDGET = 200000  # tokens of a page that are summarized at most; the rest is dropped
+SUMMARY_REDUCE_LEVELS = 1  # times combined chunk summaries may be chunked again; after that they are cut to SUMMARY_CHUNK_TOKENS
+
+# Source summaries sent to the models, in estimated tokens per call site
+CONTEXT_BUDGETS = {"serp": 8000, "toc": 60000, "section": 40000}
+CONTEXT_COMPRESSED_TOKENS = 150  # sources that no longer fit in full are shortened to this size
+
+# Relevance gate before summarization (research mode)
+RELEVANCE_GATE_ENABLED = True
+RELEVANCE_THRESHOLD = 0.2  # minimum cosine similarity between the research question and a page sample
+RELEVANCE_MIN_WORDS = 80  # shorter pages are skipped
+RELEVANCE_SAMPLE_TOKENS = 1500  # size of the page sample that is embedded
+
+# Near-duplicate pages (SimHash over word shingles)
+NEAR_DUPLICATE_ENABLED = True
+NEAR_DUPLICATE_MAX_DISTANCE = 3  # differing fingerprint bits (of 64) still treated as the same page
+NEAR_DUPLICATE_MIN_TOKENS = 50  # shorter pages are always summarized on their own
+
+# Browser pool shared by all crawls
+CRAWLER_POOL_SIZE = 2  # warm headless browsers
+CRAWLER_PAGES_PER_BROWSER = 5  # pages rendered concurrently by one browser
+CRAWLER_RECYCLE_AFTER = 50  # pages after which a browser is replaced
+
+# Persistent page store
+PAGE_STORE_ENABLED = True
+PAGE_STORE_MAX_BYTES = 500 * 1024 * 1024  # compressed markdown
+PAGE_FRESHNESS = 24 * 3600  # seconds a stored page is used without asking the server
+
+# Plain HTTP fetching (fast path and revalidation)
+FAST_PATH_ENABLED = True  # try a plain GET before rendering a page in the browser
+FAST_PATH_MIN_WORDS = 150  # pages yielding fewer words are rendered in the browser instead
+FAST_PATH_MAX_BYTES = 20 * 1024 * 1024
+HTTP_FETCH_TIMEOUT = 15.0  # seconds
+HTTP_MAX_CONNECTIONS = 50
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_USER_AGENT = "Mozilla/5.0 (compatible; ResearchPal/1.0)"
+
 # Reference extraction settings
 MAX_REFERENCE_PER_PARAGRAPH = 3
 
+# OpenAI client connection pool settings
+OPENAI_MAX_CONNECTIONS = 100
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 20
+OPENAI_KEEPALIVE_EXPIRY = 30.0  # seconds an idle connection is kept open
+
+# OpenAI request scheduling: per-model requests and tokens per minute
+MODEL_RATE_LIMITS = {
+    "chatgpt-4o-latest": {"rpm": 500, "tpm": 30000},
+    "o3-mini": {"rpm": 500, "tpm": 200000},
+    "gpt-4.1-mini": {"rpm": 500, "tpm": 200000},
+    "gpt-4.1": {"rpm": 500, "tpm": 30000},
+    "text-embedding-3-small": {"rpm": 3000, "tpm": 1000000},
+}
+DEFAULT_RATE_LIMIT = {"rpm": 500, "tpm": 30000}
+LLM_INITIAL_CONCURRENCY = 8
+LLM_MIN_CONCURRENCY = 1
+LLM_MAX_CONCURRENCY = 64
+LLM_MAX_RETRIES = 6
+LLM_BACKOFF_BASE = 1.0  # seconds
+LLM_BACKOFF_CAP = 60.0  # seconds
+LLM_COMPLETION_TOKEN_ESTIMATE = 1000  # charged to the TPM bucket before the real usage is known
+
+# Estimated prices in USD per million tokens, used for the run cost report
+MODEL_PRICING = {
+    "chatgpt-4o-latest": {"input": 5.00, "cached_input": 5.00, "output": 15.00},
+    "o3-mini": {"input": 1.10, "cached_input": 0.55, "output": 4.40},
+    "gpt-4.1-mini": {"input": 0.40, "cached_input": 0.10, "output": 1.60},
+    "gpt-4.1": {"input": 2.00, "cached_input": 0.50, "output": 8.00},
+    "text-embedding-3-small": {"input": 0.02},
+}
+
+# Embedding settings
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_MAX_INPUTS_PER_REQUEST = 2048  # provider limit on inputs per request
+EMBEDDING_MAX_TOKENS_PER_REQUEST = 200000  # kept below the provider limit of 300k
+
+# Local cache settings
+CACHE_DIR = ".cache"
+
+# Checkpoints of research runs, one directory per run
+RUNS_DIR = "output/runs"
+
+# On-disk embedding store
+EMBEDDING_STORE_ENABLED = True
+EMBEDDING_STORE_MAX_ENTRIES = 200000  # compacted down to this size at the end of a run
+
+# Offline local-corpus search
+LOCAL_CORPUS_DIR = "corpus"
+LOCAL_CORPUS_EXTENSIONS = (".md", ".markdown", ".txt", ".html", ".htm", ".pdf")
+LOCAL_INDEX_PATH = CACHE_DIR + "/local_index.sqlite"
+
+# SERP result cache
+SERP_CACHE_ENABLED = True
+SERP_CACHE_MAX_BYTES = 20 * 1024 * 1024
+SERP_CACHE_TTL = 7 * 24 * 3600  # seconds
+SERP_CACHE_SERVE_STALE = True  # serve expired results and refresh them in the background
+SERP_CACHE_MAX_STALE = 30 * 24 * 3600  # seconds past the TTL after which results are no longer served
+
+# LLM response cache (deterministic models only by default)
+LLM_CACHE_ENABLED = True
+LLM_CACHE_MAX_BYTES = 200 * 1024 * 1024
+LLM_CACHE_TTL = 30 * 24 * 3600  # seconds
@@ -0,0 +1,125 @@
+"""
+Token-budgeted research context.
+Source summaries accumulate with every query and page. Each call site that
+sends them to a model (SERP generation, table of contents, section drafts)
+gets a token budget; when the summaries do not fit, the sources most
+relevant to the call's query or research question are kept, shortened once
+full summaries no longer fit, instead of overflowing the prompt.
+"""
+
+import re
+import numpy as np
+from src.ai import get_embeddings, AIResponseError
+from src.utils import estimate_tokens, format_source
+from src.config import CONTEXT_BUDGETS, CONTEXT_COMPRESSED_TOKENS
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def compress_summary(summary, max_tokens):
+    """
+    Shorten a summary to its leading sentences within max_tokens (estimated).
+    """
+    summary = summary.strip()
+    if estimate_tokens(summary) <= max_tokens:
+        return summary
+    head = summary[:max_tokens * 4]
+    sentences = SENTENCE_END.split(head)
+    if len(sentences) > 1:
+        # Drop the sentence that was cut off.
+        head = " ".join(sentences[:-1])
+    return head.rstrip() + " ..."
+
+
+def format_sources(sources):
+    """
+    Format source summaries as delimited blocks for a prompt.
+    """
+    return "".join(format_source(source["url"], source["summary"]) for source in sources)
+
+
+class ContextBudget:
+    """
+    Fits source summaries into per-call-site token budgets.
+
+    Parameters:
+        budgets (dict): Tokens of source summaries allowed per call site.
+        compressed_tokens (int): Size a source is shortened to once its full summary no longer fits.
+    """
+
+    def __init__(self, budgets, compressed_tokens):
+        self.budgets = budgets
+        self.compressed_tokens = compressed_tokens
+        self.sites = {}
+
+    def _record(self, site, full, compressed, dropped, tokens):
+        counts = self.sites.setdefault(site, {"calls": 0, "full": 0, "compressed": 0, "dropped": 0, "tokens": 0})
+        counts["calls"] += 1
+        counts["full"] += full
+        counts["compressed"] += compressed
+        counts["dropped"] += dropped
+        counts["tokens"] += tokens
+
+    async def _rank(self, sources, focus):
+        """
+        Return source indices by descending similarity to focus; the original order if embedding fails.
+        """
+        try:
+            embeddings = await get_embeddings([focus] + [source["summary"] for source in sources], tag="context")
+        except AIResponseError as e:
+            print(f"Context ranking failed, keeping source order: {e}")
+            return list(range(len(sources)))
+        norms = np.linalg.norm(embeddings, axis=1)
+        norms[norms == 0] = 1.0
+        scores = (embeddings[1:] @ embeddings[0]) / (norms[1:] * norms[0])
+        return [int(i) for i in np.argsort(-scores, kind="stable")]
+
+    async def select(self, site, sources, focus):
+        """
+        Choose the source summaries sent to a call site within its budget.
+
+        Parameters:
+            site (str): The call site, a key of budgets.
+            sources (list): Dicts with 'url' and 'summary'.
+            focus (str): The query or topic the sources are ranked against.
+
+        Returns:
+            list: Dicts with 'url' and 'summary', shortened where needed. When all sources fit they are
+            returned in full and in their original order, so that the prompt stays the same between calls.
+        """
+        sources = [{"url": source["url"], "summary": source["summary"]} for source in sources if source.get("summary")]
+        budget = self.budgets[site]
+        sizes = [estimate_tokens(format_source(source["url"], source["summary"])) for source in sources]
+        if sum(sizes) <= budget:
+            self._record(site, len(sources), 0, 0, sum(sizes))
+            return sources
+
+        # Most relevant sources first, in full while they fit, then shortened.
+        selected = []
+        used = full = compressed = 0
+        for index in await self._rank(sources, focus):
+            source, size = sources[index], sizes[index]
+            if size > budget - used:
+                source = {"url": source["url"], "summary": compress_summary(source["summary"], self.compressed_tokens)}
+                size = estimate_tokens(format_source(source["url"], source["summary"]))
+                if size > budget - used:
+                    continue
+                compressed += 1
+            else:
+                full += 1
+            selected.append(source)
+            used += size
+        self._record(site, full, compressed, len(sources) - full - compressed, used)
+        return selected
+
+    async def fit(self, site, sources, focus):
+        """
+        Format the source summaries chosen by select() for a call site.
+        """
+        return format_sources(await self.select(site, sources, focus))
+
+    def stats(self):
+        return {"budgets": dict(self.budgets), "sites": {site: dict(counts) for site, counts in self.sites.items()}}
+
+
+research_context = ContextBudget(CONTEXT_BUDGETS, CONTEXT_COMPRESSED_TOKENS)
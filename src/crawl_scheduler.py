@@ -0,0 +1,160 @@
+"""
+Politeness scheduling for page fetches.
+Caps the number of pages fetched at once, limits concurrency and spaces out
+requests per domain, and interleaves domains round-robin so that one slow
+host cannot hold up the rest of a depth.
+"""
+
+import asyncio
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+
+def url_domain(url):
+    """
+    Return the lower-case host name of a URL (empty for URLs without a host).
+    """
+    return (urlparse(url).hostname or "").lower()
+
+
+class DomainStats:
+    def __init__(self):
+        self.fetches = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+
+class CrawlScheduler:
+    """
+    Process-wide fetch scheduler.
+
+    Parameters:
+        max_concurrency (int): Pages fetched at once across all domains.
+        per_domain_concurrency (int): Pages fetched at once from a single domain.
+        per_domain_delay (float): Minimum seconds between the start of two fetches from one domain.
+    """
+
+    def __init__(self, max_concurrency, per_domain_concurrency, per_domain_delay):
+        self.max_concurrency = max_concurrency
+        self.per_domain_concurrency = per_domain_concurrency
+        self.per_domain_delay = per_domain_delay
+        self._queues = {}
+        self._ring = deque()
+        self._active = {}
+        self._active_total = 0
+        self._next_start = {}
+        self._timer = None
+        self.queued = 0
+        self.max_queue_depth = 0
+        self.total_queue_wait = 0.0
+        self.started = 0
+        self.domains = {}
+
+    async def submit(self, url, call):
+        """
+        Queue a fetch of url and wait for its result.
+
+        Parameters:
+            url (str): The URL, used to pick the domain queue.
+            call: A zero-argument function returning the fetch coroutine.
+        """
+        domain = url_domain(url)
+        future = asyncio.get_running_loop().create_future()
+        if domain not in self._queues:
+            self._queues[domain] = deque()
+            self._ring.append(domain)
+        self._queues[domain].append((call, future, time.monotonic()))
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        self._dispatch()
+        return await future
+
+    def _eligible(self, domain, now):
+        return (self._active.get(domain, 0) < self.per_domain_concurrency
+                and now >= self._next_start.get(domain, 0.0))
+
+    def _dispatch(self):
+        now = time.monotonic()
+        # Round-robin over domains: each pass starts at most one fetch per domain.
+        started_any = True
+        while started_any and self._active_total < self.max_concurrency and self._ring:
+            started_any = False
+            for _ in range(len(self._ring)):
+                if self._active_total >= self.max_concurrency:
+                    break
+                domain = self._ring.popleft()
+                queue = self._queues[domain]
+                if self._eligible(domain, now):
+                    call, future, enqueued = queue.popleft()
+                    self.queued -= 1
+                    if not future.cancelled():
+                        self._start(domain, call, future, enqueued, now)
+                        started_any = True
+                if queue:
+                    self._ring.append(domain)
+                else:
+                    del self._queues[domain]
+        self._schedule_wakeup(now)
+
+    def _schedule_wakeup(self, now):
+        # Domains that are only waiting for their delay need a timer; slot releases trigger dispatch themselves.
+        if self._active_total >= self.max_concurrency:
+            return
+        waits = [self._next_start[domain] - now for domain in self._ring
+                 if self._active.get(domain, 0) < self.per_domain_concurrency and self._next_start.get(domain, 0.0) > now]
+        if not waits:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(min(waits), self._dispatch)
+
+    def _start(self, domain, call, future, enqueued, now):
+        self._active[domain] = self._active.get(domain, 0) + 1
+        self._active_total += 1
+        self._next_start[domain] = now + self.per_domain_delay
+        self.started += 1
+        self.total_queue_wait += now - enqueued
+        asyncio.ensure_future(self._run(domain, call, future))
+
+    async def _run(self, domain, call, future):
+        started = time.monotonic()
+        stats = self.domains.setdefault(domain, DomainStats())
+        try:
+            result = await call()
+        except Exception as e:
+            stats.failures += 1
+            if not future.cancelled():
+                future.set_exception(e)
+        else:
+            if not future.cancelled():
+                future.set_result(result)
+        finally:
+            latency = time.monotonic() - started
+            stats.fetches += 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+            self._active[domain] -= 1
+            self._active_total -= 1
+            self._dispatch()
+
+    def stats(self):
+        """
+        Return queue-depth and per-domain latency metrics.
+        """
+        return {
+            "fetches": self.started,
+            "queued": self.queued,
+            "max_queue_depth": self.max_queue_depth,
+            "avg_queue_wait": self.total_queue_wait / self.started if self.started else 0.0,
+            "domains": {
+                domain: {
+                    "fetches": stats.fetches,
+                    "failures": stats.failures,
+                    "avg_latency": stats.total_latency / stats.fetches if stats.fetches else 0.0,
+                    "max_latency": stats.max_latency,
+                }
+                for domain, stats in self.domains.items()
+            },
+        }
@@ -4,23 +4,52 @@ For each URL, crawls and extracts markdown content.
 """
 
 import asyncio
-from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, CacheMode, DefaultMarkdownGenerator, PruningContentFilter
+import os
+import time
+import httpx
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+from crawl4ai import CrawlerRunConfig, CacheMode, DefaultMarkdownGenerator, PruningContentFilter
 from src.ai import get_ai_responses
-from src.prompts import summarize_crawl
-from src.utils import ModelType
-async def crawl_url(url):
-    """
-    Crawl a single URL using Crawl4AI.
-    
-    Parameters:
-       url (str): The URL to crawl.
-    
-    Returns:
-       dict: A dictionary with keys 'url', 'success', and 'markdown'.
-    """
-    crawler_config = CrawlerRunConfig(
+from src.prompts import summarize_crawl, summarize_chunk
+from src.utils import ModelType, estimate_tokens, chunk_text
+from src.local_search import extract_text
+from src.crawler_pool import CrawlerPool, BrowserCrashed, is_browser_crash
+from src.crawl_scheduler import CrawlScheduler
+from src.page_store import PageStore
+from src.urls import canonicalize_url, find_rel_canonical
+from src.near_duplicates import NearDuplicateIndex
+from src.fast_fetch import fetch_fast, FetchStats
+from src.relevance_gate import RelevanceGate
+from src.config import (
+    CRAWLER_POOL_SIZE, CRAWLER_PAGES_PER_BROWSER, CRAWLER_RECYCLE_AFTER,
+    CRAWL_MAX_CONCURRENCY, CRAWL_PER_DOMAIN_CONCURRENCY, CRAWL_PER_DOMAIN_DELAY,
+    CACHE_DIR, PAGE_STORE_ENABLED, PAGE_STORE_MAX_BYTES, PAGE_FRESHNESS,
+    FAST_PATH_ENABLED, FAST_PATH_MIN_WORDS, FAST_PATH_MAX_BYTES,
+    HTTP_FETCH_TIMEOUT, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS, HTTP_USER_AGENT,
+    SUMMARY_CHUNK_TOKENS, SUMMARY_PAGE_TOKEN_BUDGET, SUMMARY_REDUCE_LEVELS, NEAR_DUPLICATE_ENABLED,
+    RELEVANCE_GATE_ENABLED, RELEVANCE_THRESHOLD, RELEVANCE_MIN_WORDS, RELEVANCE_SAMPLE_TOKENS, NEAR_DUPLICATE_MAX_DISTANCE, NEAR_DUPLICATE_MIN_TOKENS,
+)
+
+# Warm browsers shared by every crawl in the run.
+crawler_pool = CrawlerPool(CRAWLER_POOL_SIZE, CRAWLER_PAGES_PER_BROWSER, CRAWLER_RECYCLE_AFTER)
+# Global and per-domain limits on page fetches.
+crawl_scheduler = CrawlScheduler(CRAWL_MAX_CONCURRENCY, CRAWL_PER_DOMAIN_CONCURRENCY, CRAWL_PER_DOMAIN_DELAY)
+# Pages and summaries from earlier runs, revalidated with conditional requests once they are past PAGE_FRESHNESS.
+page_store = PageStore(os.path.join(CACHE_DIR, "pages.sqlite"), max_bytes=PAGE_STORE_MAX_BYTES)
+# Pages crawled in this run, clustered by near-duplicate content.
+near_duplicates = NearDuplicateIndex(NEAR_DUPLICATE_MAX_DISTANCE, NEAR_DUPLICATE_MIN_TOKENS)
+# Canonical URL -> (URL, summary future) of the first page summarized under it in this run.
+page_claims = {}
+# Skips off-topic and boilerplate pages before they are summarized.
+relevance_gate = RelevanceGate(RELEVANCE_THRESHOLD, RELEVANCE_MIN_WORDS, RELEVANCE_SAMPLE_TOKENS)
+# Pages served by the plain HTTP fast path versus the browser.
+fetch_stats = FetchStats()
+_http_client = None
+
+crawler_config = CrawlerRunConfig(
+    # Reuse across runs is handled by page_store, which revalidates instead of trusting a local copy blindly.
     cache_mode=CacheMode.BYPASS,
-    
     markdown_generator=DefaultMarkdownGenerator(
         content_filter=PruningContentFilter(
             threshold=0.35,  # Less aggressive filtering (was 0.5)
@@ -28,33 +57,309 @@ async def crawl_url(url):
             min_word_threshold=20  # Retain more short sections
         )
     ),
-    
     exclude_external_links=False,  # Allow external references for research
     exclude_social_media_links=True,  # Still remove distracting social links
-    )
-    try:
-        async with AsyncWebCrawler() as crawler:
+)
+
+def get_http_client():
+    """
+    Return the shared HTTP client used for requests that need no browser.
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=HTTP_FETCH_TIMEOUT,
+            follow_redirects=True,
+            headers={"User-Agent": HTTP_USER_AGENT},
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS),
+        )
+    return _http_client
+
+def response_header(headers, name):
+    """
+    Look up a response header case-insensitively in a plain dict.
+    """
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+async def revalidate_page(url, page):
+    """
+    Ask the server whether a stored page changed, using its ETag and Last-Modified validators.
+
+    Returns:
+       bool: True when the server confirms the stored page is still current.
+    """
+    headers = {}
+    if page["etag"]:
+        headers["If-None-Match"] = page["etag"]
+    if page["last_modified"]:
+        headers["If-Modified-Since"] = page["last_modified"]
+    if not headers:
+        return False
+    # Only the status line and headers are needed, so the body is never read.
+    async with get_http_client().stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            return True
+        # Some servers ignore conditional headers but still send a matching ETag.
+        return response.status_code == 200 and page["etag"] is not None and response.headers.get("etag") == page["etag"]
+
+async def read_local_file(url):
+    """
+    Read a file:// URL (as returned by the local search backend) without a browser.
+    """
+    path = url2pathname(urlparse(url).path)
+    return await asyncio.to_thread(extract_text, path)
+
+async def render_page(url):
+    """
+    Render a page in a pooled browser.
+
+    Returns:
+       dict: 'markdown', 'headers' and 'canonical' (the rel=canonical URL or None), or None when the crawl failed.
+    """
+    async def fetch():
+        started = time.monotonic()
+        async with crawler_pool.crawler() as crawler:
             result = await crawler.arun(url, config=crawler_config)
-            if result.success:
-                messages = summarize_crawl + [{"role": "user", "content": result.markdown}]
-                summary = await get_ai_responses(messages=messages, model= ModelType.SUMMARIZING)
-            return {
-                "url": url,
-                "success": result.success,
-                "summary": summary if result.success else ""
-            }
+            # arun() reports a dead browser as a failed result, so it is raised here for the pool to replace it.
+            if not result.success and is_browser_crash(result.error_message):
+                raise BrowserCrashed(result.error_message)
+        fetch_stats.record("browser", time.monotonic() - started)
+        return result
+    # The browser is handed back before summarizing so it can render the next page.
+    try:
+        result = await crawl_scheduler.submit(url, fetch)
+    except BrowserCrashed as e:
+        print(f"Browser crashed while crawling {url}: {e}")
+        return None
+    if not result.success:
+        return None
+    return {
+        "markdown": str(result.markdown),
+        "headers": result.response_headers,
+        "canonical": find_rel_canonical(result.html or "", result.url or url),
+    }
+
+async def fetch_page(url):
+    """
+    Fetch a page with a plain HTTP request, falling back to the browser when
+    the page looks rendered by JavaScript or yields too little text.
+
+    Returns:
+       dict: 'markdown', 'headers' and 'canonical' (the rel=canonical URL or None), or None when the page could not be fetched.
+    """
+    if FAST_PATH_ENABLED:
+        async def fetch():
+            started = time.monotonic()
+            page = await fetch_fast(get_http_client(), url, FAST_PATH_MIN_WORDS, FAST_PATH_MAX_BYTES)
+            fetch_stats.record("fast" if page[1] is None else "fast-escalated", time.monotonic() - started)
+            return page
+        page, reason = await crawl_scheduler.submit(url, fetch)
+        if reason is None:
+            return page
+        fetch_stats.escalate(reason)
+    return await render_page(url)
+
+async def summarize_page(markdown, level=0):
+    """
+    Summarize page markdown with the SUMMARIZING model.
+    Pages longer than SUMMARY_CHUNK_TOKENS are cut to SUMMARY_PAGE_TOKEN_BUDGET,
+    split into chunks that are summarized in parallel, and the chunk summaries
+    are combined into one page summary.
+
+    Parameters:
+       markdown (str): The page content, or the combined chunk summaries when level > 0.
+       level (int): How many times the text was already reduced from chunk summaries.
+    """
+    if estimate_tokens(markdown) <= SUMMARY_CHUNK_TOKENS or level > SUMMARY_REDUCE_LEVELS:
+        # Past SUMMARY_REDUCE_LEVELS the combined summaries are cut so that the final call fits.
+        messages = summarize_crawl + [{"role": "user", "content": markdown[:SUMMARY_CHUNK_TOKENS * 4]}]
+        return await get_ai_responses(messages=messages, model= ModelType.SUMMARIZING, tag="crawl-summary")
+    chunks = chunk_text(markdown[:SUMMARY_PAGE_TOKEN_BUDGET * 4], SUMMARY_CHUNK_TOKENS)
+    replies = await asyncio.gather(*(
+        get_ai_responses(
+            messages=summarize_chunk + [{"role": "user", "content": f"Part {i} of {len(chunks)}\n\n{chunk}"}],
+            model=ModelType.SUMMARIZING, tag="crawl-summary-chunk")
+        for i, chunk in enumerate(chunks, start=1)
+    ), return_exceptions=True)
+    # A failed chunk leaves a gap in the summary rather than failing the whole page.
+    partials = [reply for reply in replies if not isinstance(reply, BaseException)]
+    if not partials:
+        raise replies[0]
+    combined = "\n\n".join(f"## Part {i}\n\n{partial.strip()}" for i, partial in enumerate(partials, start=1))
+    # Chunk summaries are usually far shorter than their chunks; when they still do not fit in one call they are
+    # chunked again, at most SUMMARY_REDUCE_LEVELS times.
+    return await summarize_page(combined, level + 1)
+
+async def summarize_unique(url, markdown, summary=None, canonical=None):
+    """
+    Summarize a page unless the same page (by canonical URL) or a near-duplicate
+    of it was already summarized in this run.
+
+    Parameters:
+       url (str): The page URL.
+       markdown (str): The page content.
+       summary (str): A summary already known for this exact content, e.g. from the page store.
+       canonical (str): The page's rel=canonical URL, if it declares one.
+
+    Returns:
+       tuple: (summary, URL of the page this one duplicates or None).
+    """
+    key = canonicalize_url(canonical or url)
+    claim = page_claims.get(key)
+    if claim is not None and claim[0] != url:
+        representative, representative_summary = claim
+        shared = await representative_summary
+        if shared:
+            near_duplicates.attach(representative, url, saved_call=summary is None)
+            return shared, representative
+    fingerprint = await asyncio.to_thread(near_duplicates.fingerprint, markdown) if NEAR_DUPLICATE_ENABLED else None
+    # No await between matching and registering, so two copies of a page cannot both become representatives.
+    if fingerprint is not None:
+        match = near_duplicates.match(fingerprint)
+        if match is not None and match[0] != url:
+            representative, representative_summary = match
+            shared = await representative_summary
+            if shared:
+                near_duplicates.attach(representative, url, saved_call=summary is None)
+                return shared, representative
+    future = asyncio.get_running_loop().create_future()
+    # Registered before summarizing so that duplicates arriving meanwhile wait for this summary.
+    page_claims[key] = (url, future)
+    if fingerprint is not None:
+        near_duplicates.add(url, fingerprint, future)
+    try:
+        if summary is None:
+            summary = await summarize_page(markdown)
+    finally:
+        future.set_result(summary)
+    return summary, None
+
+async def gated_summary(url, markdown, topic, summary=None, canonical=None):
+    """
+    Summarize a page through summarize_unique unless the relevance gate rejects it for topic.
+
+    Returns:
+       dict: The crawl result for url.
+    """
+    if topic is not None and RELEVANCE_GATE_ENABLED:
+        reason, score = await relevance_gate.check(topic, markdown)
+        if reason is not None:
+            return {"url": url, "success": False, "summary": "", "skipped": reason, "relevance": score}
+    summary, duplicate_of = await summarize_unique(url, markdown, summary, canonical=canonical)
+    return {"url": url, "success": True, "summary": summary, "duplicate_of": duplicate_of}
+
+async def crawl_url(url, topic=None):
+    """
+    Crawl a single URL using Crawl4AI. Local file:// URLs are read directly.
+    
+    Parameters:
+       url (str): The URL to crawl.
+       topic (str): The research question; when given, pages that fail the relevance gate are not summarized.
+    
+    Returns:
+       dict: A dictionary with keys 'url', 'success', 'summary' and 'duplicate_of' (the URL whose summary was reused, if any),
+             or 'skipped' (the reason) and 'relevance' for pages the relevance gate rejected.
+    """
+    try:
+        if url.startswith("file://"):
+            text = await read_local_file(url)
+            if not text.strip():
+                return {"url": url, "success": False, "summary": "", "error": "No text could be extracted."}
+            return await gated_summary(url, text, topic)
+        key = canonicalize_url(url)
+        page = page_store.get(key) if PAGE_STORE_ENABLED else None
+        if page is not None and page["summary"]:
+            if page["age"] < PAGE_FRESHNESS:
+                page_store.fresh_hits += 1
+                return await gated_summary(url, page["markdown"], topic, page["summary"])
+            try:
+                unchanged = await crawl_scheduler.submit(url, lambda: revalidate_page(url, page))
+            except httpx.HTTPError:
+                unchanged = False
+            if unchanged:
+                page_store.revalidated += 1
+                page_store.mark_validated(key)
+                return await gated_summary(url, page["markdown"], topic, page["summary"])
+            page_store.changed += 1
+        else:
+            page_store.misses += 1
+        fetched = await fetch_page(url)
+        if fetched is None:
+            return {"url": url, "success": False, "summary": ""}
+        markdown, headers = fetched["markdown"], fetched["headers"]
+        known = page["summary"] if page is not None and page["markdown"] == markdown else None
+        result = await gated_summary(url, markdown, topic, known, canonical=fetched["canonical"])
+        if PAGE_STORE_ENABLED:
+            page_store.put(key, markdown, etag=response_header(headers, "etag"),
+                           last_modified=response_header(headers, "last-modified"), summary=result["summary"] or None)
+        return result
     except Exception as e:
         return {"url": url, "success": False, "summary":"","error": str(e)}
 
-async def crawl_urls(urls):
+class CrawlStream:
     """
-    Crawl a list of URLs concurrently.
+    Crawl results in completion order, for use with `async for`.
+    Pages that have not been consumed when iteration stops keep crawling and
+    can be collected later through pending().
+    """
+
+    def __init__(self, urls, topic=None):
+        self._finished = asyncio.Queue()
+        self._consumed = set()
+        self.urls = list(urls)
+        self.tasks = [asyncio.ensure_future(crawl_url(url, topic)) for url in self.urls]
+        for task in self.tasks:
+            task.add_done_callback(self._finished.put_nowait)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if len(self._consumed) == len(self.tasks):
+            raise StopAsyncIteration
+        task = await self._finished.get()
+        self._consumed.add(task)
+        return task.result()
+
+    def pending(self):
+        """
+        Return the tasks whose results have not been consumed yet.
+        """
+        return [task for task in self.tasks if task not in self._consumed]
+
+    def pending_urls(self):
+        """
+        Return the URLs of the tasks returned by pending().
+        """
+        return [url for url, task in zip(self.urls, self.tasks) if task not in self._consumed]
+
+def crawl_urls(urls, as_completed=False, topic=None):
+    """
+    Crawl a list of URLs concurrently. Fetches are throttled globally and per
+    domain by crawl_scheduler; summaries run as soon as each page arrives.
     
     Parameters:
        urls (List[str]): The list of URLs.
+       as_completed (bool): Return a CrawlStream yielding each result as soon as its page is done.
+       topic (str): The research question used by the relevance gate.
     
     Returns:
-       List[dict]: List of crawl result dictionaries.
+       An awaitable resolving to the list of crawl result dictionaries in input order, or a CrawlStream.
+    """
+    if as_completed:
+        return CrawlStream(urls, topic)
+    return asyncio.gather(*(crawl_url(url, topic) for url in urls))
+
+async def close_crawling():
+    """
+    Close the browser pool, the shared HTTP client and the page store.
     """
-    tasks = [crawl_url(url) for url in urls]
-    return await asyncio.gather(*tasks)
\ No newline at end of file
+    global _http_client
+    await crawler_pool.close()
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    page_store.close()
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""
+A pool of warm headless browsers shared by all crawls in a run.
+Each pooled AsyncWebCrawler serves several pages at once and is recycled
+after a fixed number of pages or when it crashes.
+"""
+
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager
+from crawl4ai import AsyncWebCrawler
+
+# Playwright errors for a browser, context or page that went away. Crawl4AI reports them as failed
+# results instead of raising, so the caller checks the error message with is_browser_crash().
+BROWSER_CRASH_MARKERS = re.compile(r"\b(?:target|browser|context)\b.*\b(?:closed|disconnected|crashed)\b", re.IGNORECASE)
+# Crawl4AI's error message quotes the failing source code after the "Error: ..." line.
+ERROR_LINE = re.compile(r"^Error: (.*)$", re.MULTILINE)
+
+
+class BrowserCrashed(Exception):
+    """
+    Raised inside CrawlerPool.crawler() when the borrowed browser failed, so that it is replaced.
+    """
+
+
+def is_browser_crash(error_message):
+    """
+    Return True when a failed crawl's error message points at the browser rather than the page.
+    """
+    if not error_message:
+        return False
+    match = ERROR_LINE.search(error_message)
+    return BROWSER_CRASH_MARKERS.search(match.group(1) if match else error_message) is not None
+
+
+class _PooledCrawler:
+    def __init__(self):
+        self.crawler = None
+        self.starting = None
+        self.active = 0
+        self.pages = 0
+        self.retiring = False
+
+
+class CrawlerPool:
+    """
+    Bounded pool of AsyncWebCrawler instances.
+
+    Parameters:
+        size (int): Number of browsers kept alive.
+        pages_per_browser (int): Pages a single browser may render concurrently.
+        recycle_after (int): Pages after which a browser is closed and replaced.
+    """
+
+    def __init__(self, size, pages_per_browser, recycle_after):
+        self.size = size
+        self.pages_per_browser = pages_per_browser
+        self.recycle_after = recycle_after
+        self._entries = [_PooledCrawler() for _ in range(size)]
+        self._condition = None
+        self.started_at = None
+        self.pages = 0
+        self.launches = 0
+        self.recycles = 0
+        self.crashes = 0
+        self.peak_in_use = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+
+    @property
+    def condition(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _in_use(self):
+        return sum(entry.active for entry in self._entries)
+
+    def _pick(self):
+        # Prefer the least loaded browser that is already running, so warm browsers are reused.
+        candidates = [e for e in self._entries if not e.retiring and e.active < self.pages_per_browser]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda e: (e.crawler is None and e.starting is None, e.active))
+
+    async def _ensure_started(self, entry):
+        if entry.crawler is not None:
+            return entry.crawler
+        if entry.starting is None:
+            async def launch():
+                crawler = AsyncWebCrawler()
+                await crawler.start()
+                self.launches += 1
+                return crawler
+            entry.starting = asyncio.ensure_future(launch())
+        try:
+            entry.crawler = await entry.starting
+        except Exception:
+            entry.starting = None
+            raise
+        return entry.crawler
+
+    def _detach(self, entry):
+        # Reset the slot so that the next borrower launches a fresh browser.
+        crawler = entry.crawler
+        entry.crawler = None
+        entry.starting = None
+        entry.pages = 0
+        entry.retiring = False
+        return crawler
+
+    async def _close_crawler(self, crawler):
+        if crawler is None:
+            return
+        try:
+            await crawler.close()
+        except Exception as e:
+            print(f"Error closing crawler: {e}")
+
+    @asynccontextmanager
+    async def crawler(self):
+        """
+        Borrow a warm crawler for one page. A crawler whose use raises an
+        exception (such as BrowserCrashed) is treated as crashed and replaced.
+        """
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        requested = time.monotonic()
+        async with self.condition:
+            await self.condition.wait_for(lambda: self._pick() is not None)
+            entry = self._pick()
+            entry.active += 1
+            self.peak_in_use = max(self.peak_in_use, self._in_use())
+        started = time.monotonic()
+        self.wait_time += started - requested
+        crashed = False
+        try:
+            yield await self._ensure_started(entry)
+        except Exception:
+            crashed = True
+            raise
+        finally:
+            self.busy_time += time.monotonic() - started
+            self.pages += 1
+            retired = None
+            async with self.condition:
+                entry.active -= 1
+                entry.pages += 1
+                if crashed:
+                    self.crashes += 1
+                    entry.retiring = True
+                elif entry.pages >= self.recycle_after:
+                    entry.retiring = True
+                if entry.retiring and entry.active == 0:
+                    self.recycles += 1
+                    retired = self._detach(entry)
+                self.condition.notify_all()
+            await self._close_crawler(retired)
+
+    async def close(self):
+        """
+        Close every browser in the pool.
+        """
+        for entry in self._entries:
+            if entry.starting is not None and entry.crawler is None:
+                try:
+                    entry.crawler = await entry.starting
+                except Exception:
+                    pass
+            await self._close_crawler(self._detach(entry))
+
+    def stats(self):
+        """
+        Return pool utilization: the share of available page slots that were busy
+        since the first crawl, plus launch, recycle and crash counts.
+        """
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        capacity = elapsed * self.size * self.pages_per_browser
+        return {
+            "pages": self.pages,
+            "browser_launches": self.launches,
+            "recycles": self.recycles,
+            "crashes": self.crashes,
+            "peak_in_use": self.peak_in_use,
+            "slots": self.size * self.pages_per_browser,
+            "utilization": self.busy_time / capacity if capacity else 0.0,
+            "avg_wait_time": self.wait_time / self.pages if self.pages else 0.0,
+        }
@@ -0,0 +1,181 @@
+"""
+On-disk embedding store for My ResearchPal.
+Vectors are kept in an append-only float32 file that is memory-mapped for
+reads, with a compact index of 16-byte text hashes mapping to row numbers.
+"""
+
+import hashlib
+import json
+import os
+import numpy as np
+
+KEY_SIZE = 16
+
+
+def text_key(text):
+    """
+    Return the 16-byte hash used to index a text.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+
+class EmbeddingStore:
+    """
+    Append-only embedding store for a single embedding model.
+
+    Files in the store directory:
+        vectors.f32 - raw float32 rows, one per stored text
+        keys.bin    - 16-byte text hashes, row i belongs to vectors row i
+        meta.json   - model name and vector dimension
+
+    Parameters:
+        directory (str): Directory holding the store files.
+        model (str): The embedding model the vectors belong to.
+    """
+
+    def __init__(self, directory, model):
+        self.directory = directory
+        self.model = model
+        self.dim = None
+        self.count = 0
+        self._index = None
+        self._vectors = None
+        self._accessed = set()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.directory, "vectors.f32")
+
+    @property
+    def _keys_path(self):
+        return os.path.join(self.directory, "keys.bin")
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.directory, "meta.json")
+
+    def _load(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+        keys = b""
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, "rb") as f:
+                keys = f.read()
+        vector_rows = 0
+        if os.path.exists(self._vectors_path):
+            vector_rows = os.path.getsize(self._vectors_path) // (4 * self.dim)
+        # An interrupted append may leave one file longer than the other; trust the shorter one.
+        self.count = min(len(keys) // KEY_SIZE, vector_rows)
+        self._truncate(self.count)
+        for row in range(self.count):
+            self._index[keys[row * KEY_SIZE:(row + 1) * KEY_SIZE]] = row
+
+    def _truncate(self, rows):
+        if os.path.exists(self._keys_path) and os.path.getsize(self._keys_path) > rows * KEY_SIZE:
+            with open(self._keys_path, "r+b") as f:
+                f.truncate(rows * KEY_SIZE)
+        if os.path.exists(self._vectors_path) and os.path.getsize(self._vectors_path) > rows * 4 * self.dim:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(rows * 4 * self.dim)
+
+    def _mapped_vectors(self):
+        if self._vectors is None and self.count:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        return self._vectors
+
+    def lookup(self, texts):
+        """
+        Look up stored vectors for texts.
+
+        Returns:
+            tuple: (rows, vectors) where rows is a list with the store row for each text
+                   (or -1 when missing) and vectors is a float32 matrix of the found rows,
+                   in the same order as the texts that were found.
+        """
+        self._load()
+        rows = [self._index.get(text_key(text), -1) for text in texts]
+        found = [row for row in rows if row >= 0]
+        self.hits += len(found)
+        self.misses += len(rows) - len(found)
+        self._accessed.update(found)
+        if not found:
+            return rows, np.empty((0, self.dim or 0), dtype=np.float32)
+        return rows, np.array(self._mapped_vectors()[found], dtype=np.float32)
+
+    def add(self, texts, vectors):
+        """
+        Append vectors for texts that are not stored yet.
+        """
+        self._load()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        if self.dim is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.dim = vectors.shape[1]
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model, "dim": self.dim}, f)
+        new_keys = []
+        new_rows = []
+        for text, vector in zip(texts, vectors):
+            key = text_key(text)
+            if key in self._index:
+                continue
+            self._index[key] = self.count + len(new_keys)
+            new_keys.append(key)
+            new_rows.append(vector)
+        if not new_keys:
+            return
+        # Write vectors before keys so that a key never points past the end of the vector file.
+        with open(self._vectors_path, "ab") as f:
+            f.write(np.array(new_rows, dtype=np.float32).tobytes())
+        with open(self._keys_path, "ab") as f:
+            f.write(b"".join(new_keys))
+        self._accessed.update(range(self.count, self.count + len(new_keys)))
+        self.count += len(new_keys)
+        self._vectors = None
+
+    def compact(self, max_entries):
+        """
+        Rewrite the store keeping at most max_entries rows. Rows used in this
+        session are kept first, then the most recently appended ones.
+        """
+        self._load()
+        if self.count <= max_entries:
+            return 0
+        accessed = sorted(self._accessed, reverse=True)[:max_entries]
+        remaining = max_entries - len(accessed)
+        accessed_set = set(accessed)
+        recent = [row for row in range(self.count - 1, -1, -1) if row not in accessed_set][:remaining]
+        keep = sorted(accessed + recent)
+        rows_to_key = {row: key for key, row in self._index.items()}
+        vectors = np.array(self._mapped_vectors()[keep], dtype=np.float32)
+        self._vectors = None
+        with open(self._vectors_path + ".tmp", "wb") as f:
+            f.write(vectors.tobytes())
+        with open(self._keys_path + ".tmp", "wb") as f:
+            f.write(b"".join(rows_to_key[row] for row in keep))
+        os.replace(self._vectors_path + ".tmp", self._vectors_path)
+        os.replace(self._keys_path + ".tmp", self._keys_path)
+        removed = self.count - len(keep)
+        new_rows = {old: new for new, old in enumerate(keep)}
+        self._index = {rows_to_key[old]: new for old, new in new_rows.items()}
+        self._accessed = {new_rows[row] for row in self._accessed if row in new_rows}
+        self.count = len(keep)
+        return removed
+
+    def stats(self):
+        """
+        Return lookup counters for the current run.
+        """
+        return {"entries": self.count, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self._vectors = None
@@ -1,5 +1,5 @@
 
-from src.utils import url_separator_begin, url_separator_end
+from src.utils import format_source
 
 async def extract_learnings(crawled_results):
     """
@@ -14,9 +14,9 @@ async def extract_learnings(crawled_results):
     """
     learnings = ""
     for result in crawled_results:
-        if result.get("success"):
+        # Near-duplicates carry their representative's summary, which is already included.
+        if result.get("success") and not result.get("duplicate_of"):
             summary = result.get("summary", "")
             if summary:
-                url_str = result.get("url", "")
-                learnings += f"{url_separator_begin}\n **Source URL:** \"{url_str}\"\n{summary.strip()}\n{url_separator_end}\n\n"          
+                learnings += format_source(result.get("url", ""), summary)
     return learnings
\ No newline at end of file
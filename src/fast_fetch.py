@@ -0,0 +1,113 @@
+"""
+Plain HTTP fetching for pages that do not need a headless browser.
+Static HTML is converted to markdown locally with Crawl4AI's scraping and
+markdown generation, PDFs are read with pypdf; pages that look rendered by
+JavaScript, or that yield too little text, are left to the browser.
+"""
+
+import asyncio
+import io
+import re
+from crawl4ai import DefaultMarkdownGenerator
+from crawl4ai.content_scraping_strategy import LXMLWebScrapingStrategy
+from src.local_search import pdf_to_text
+from src.urls import find_rel_canonical
+
+# Mount points and notices of client-side rendered applications.
+JS_APP_MARKERS = re.compile(
+    r'id="(?:root|app|__next|__nuxt)"\s*>\s*</div>|data-reactroot|ng-app|enable javascript|javascript is required',
+    re.IGNORECASE,
+)
+
+
+def html_to_markdown(url, html):
+    """
+    Convert raw HTML to markdown the way Crawl4AI does after rendering a page.
+    Returns None when the HTML could not be parsed.
+    """
+    scraped = LXMLWebScrapingStrategy().scrap(url, html, exclude_social_media_links=True)
+    if not scraped.success:
+        # Crawl4AI puts an error notice in cleaned_html instead of the page content.
+        return None
+    return str(DefaultMarkdownGenerator().generate_markdown(input_html=scraped.cleaned_html, base_url=url))
+
+
+async def fetch_fast(client, url, min_words, max_bytes):
+    """
+    Fetch a page with a plain GET and extract its content without a browser.
+
+    Parameters:
+        client (httpx.AsyncClient): Pooled HTTP client.
+        url (str): The page URL.
+        min_words (int): Pages with fewer extracted words are left to the browser.
+        max_bytes (int): Larger responses are left to the browser.
+
+    Returns:
+        tuple: (page, None) on success, where page is a dict with 'markdown', 'headers' and 'canonical'
+        (the rel=canonical URL or None), or (None, reason) when the page needs the browser.
+    """
+    try:
+        async with client.stream("GET", url) as response:
+            if response.status_code != 200:
+                return None, f"status {response.status_code}"
+            content_type = response.headers.get("content-type", "").lower()
+            if "html" not in content_type and "pdf" not in content_type:
+                return None, "content type"
+            body = bytearray()
+            async for data in response.aiter_bytes():
+                body.extend(data)
+                if len(body) > max_bytes:
+                    return None, "too large"
+            headers = dict(response.headers)
+            encoding = response.encoding or "utf-8"
+    except Exception:
+        return None, "http error"
+
+    if "pdf" in content_type:
+        try:
+            markdown = await asyncio.to_thread(pdf_to_text, io.BytesIO(bytes(body)))
+        except ImportError:
+            return None, "pdf support missing"
+        except Exception:
+            return None, "unreadable pdf"
+        if len(markdown.split()) < min_words:
+            return None, "thin"
+        return {"markdown": markdown, "headers": headers, "canonical": None}, None
+
+    html = bytes(body).decode(encoding, errors="replace")
+    try:
+        markdown = await asyncio.to_thread(html_to_markdown, url, html)
+    except Exception:
+        return None, "unparsed"
+    if markdown is None:
+        return None, "unparsed"
+    if len(markdown.split()) < min_words:
+        return None, "js-rendered" if JS_APP_MARKERS.search(html) else "thin"
+    return {"markdown": markdown, "headers": headers, "canonical": find_rel_canonical(html, url)}, None
+
+
+class FetchStats:
+    """
+    Page counts and fetch latencies per fetch path ("fast" or "browser"), plus escalation reasons.
+    """
+
+    def __init__(self):
+        self.pages = {}
+        self.latency = {}
+        self.escalations = {}
+
+    def record(self, path, latency):
+        self.pages[path] = self.pages.get(path, 0) + 1
+        self.latency[path] = self.latency.get(path, 0.0) + latency
+
+    def escalate(self, reason):
+        self.escalations[reason] = self.escalations.get(reason, 0) + 1
+
+    def stats(self):
+        return {
+            "paths": {
+                path: {"pages": pages, "avg_latency": self.latency[path] / pages}
+                for path, pages in self.pages.items()
+            },
+            "escalations": dict(self.escalations),
+        }
@@ -1,6 +1,6 @@
 import asyncio
 from src.utils import url_separator_begin, url_separator_end
-from src.ai import get_ai_responses
+from src.ai import get_ai_responses, AIResponseError
 from src.utils import ModelType 
 from src.prompts import find_evidence
 
@@ -16,7 +16,11 @@ async def generate_evidence_for_a_block(block_with_references):
     user_input = "Original Statement:"+ block + "\n\n" + "Supporting Evidence:" + learnings
     
     messages = find_evidence+[{"role": "user", "content": user_input}]
-    support_evidence = await get_ai_responses(messages= messages, model= ModelType.SUMMARIZING)
+    try:
+        support_evidence = await get_ai_responses(messages= messages, model= ModelType.SUMMARIZING, tag="evidence")
+    except AIResponseError as e:
+        print(f"Skipping supporting evidence for a block: {e}")
+        return "No supporting evidence available."
     
     return support_evidence
 
@@ -16,6 +16,6 @@ async def followups(user_query_messages):
     
     """ 
     messages = generate_followup + user_query_messages
-    responses = await get_ai_responses( messages= messages, model= ModelType.REASONING)
+    responses = await get_ai_responses( messages= messages, model= ModelType.REASONING, tag="followups")
     return responses
     
\ No newline at end of file
@@ -2,11 +2,21 @@ from src.utils import split_into_three_sentences
 from src.relevant_references_selector import relevant_references_selector
 
 import asyncio
-from src.ai import get_ai_responses
+from src.ai import get_ai_responses, AIResponseError
 from src.utils import ModelType
 from src.prompts import extract_title_n_one_sentence
 
-async def generate_annotated_report(base_report, urls_with_summaries, progress=None):
+# Annotations completed between two calls of on_annotated.
+ANNOTATION_SAVE_EVERY = 10
+
+async def generate_annotated_report(base_report, urls_with_summaries, progress=None, annotations=None, on_annotated=None):
+    """
+    annotations (dict): Supporting statements by "<block index>|<url>", e.g. restored from a checkpoint;
+                        completed annotations are added to it and reused instead of regenerated.
+    on_annotated: Called every ANNOTATION_SAVE_EVERY new annotations and once at the end.
+    """
+    if annotations is None:
+        annotations = {}
     if progress:
         progress.update(f"Generating annotated report: selecting relevant references ...")  
     blocks = split_into_three_sentences(base_report)
@@ -33,19 +43,43 @@ async def generate_annotated_report(base_report, urls_with_summaries, progress=N
     # ## debug setting end ##
     if progress:
         progress.update(f"Generating annotated report: generating one sentence summary for each reference...")  
+    completed = 0
+
+    async def annotate(key, messages):
+        nonlocal completed
+        response = (await get_ai_responses(messages=messages, model=ModelType.SUMMARIZING, tag="annotation")).strip()
+        annotations[key] = response
+        completed += 1
+        if on_annotated and completed % ANNOTATION_SAVE_EVERY == 0:
+            on_annotated()
+        return response
+
     support_tasks = []
     for block_index, block_item in enumerate(blocks_with_selected_references):
         block_text = block_item["block"]
         for ref_index, ref in enumerate(block_item["selected_references"]):
-            block_text_with_summary = f"**Report Block**:\n{block_text}\n\n**Reference Summary**:\n{ref['summary']}"
+            key = f"{block_index}|{ref['url']}"
+            if key in annotations:
+                ref["supporting_statement"] = annotations[key]
+                continue
+            # The summary goes first: the same summary is often annotated against several blocks.
+            block_text_with_summary = f"**Reference Summary**:\n{ref['summary']}\n\n**Report Block**:\n{block_text}"
             messages = extract_title_n_one_sentence + [{"role": "user", "content": block_text_with_summary}]
-            task = asyncio.create_task(get_ai_responses(messages=messages, model=ModelType.SUMMARIZING))
+            task = asyncio.create_task(annotate(key, messages))
             support_tasks.append((block_index, ref_index, task))
 
     # Await all supporting statement generation tasks concurrently
-    responses = await asyncio.gather(*(task for _, _, task in support_tasks))
+    responses = await asyncio.gather(*(task for _, _, task in support_tasks), return_exceptions=True)
+    if on_annotated and completed:
+        on_annotated()
     for (block_idx, ref_idx, _), response in zip(support_tasks, responses):
-        blocks_with_selected_references[block_idx]["selected_references"][ref_idx]["supporting_statement"] = response.strip()
+        if isinstance(response, AIResponseError):
+            # Leave the reference out of the report rather than printing an error message as evidence.
+            print(f"Skipping reference annotation: {response}")
+            continue
+        if isinstance(response, BaseException):
+            raise response
+        blocks_with_selected_references[block_idx]["selected_references"][ref_idx]["supporting_statement"] = response
 
     # Format the annotated report by including the block along with its references and their new supporting statements.
     annotated_report = "\n"+ "# Annotated Report \n\n"
@@ -55,6 +89,8 @@ async def generate_annotated_report(base_report, urls_with_summaries, progress=N
         quoted_block = "> " + block_item['block'].strip().replace("\n", "\n> ")
         annotated_report += f"{quoted_block}\n\n**Supporting Evidence:**\n\n"
         for ref in block_item["selected_references"]:
+            if "supporting_statement" not in ref:
+                continue
             annotated_report += "\n---\n"+f"\n{ref['supporting_statement']}\n"
             annotated_report += "\n"+f"**Link:** [{ref['url']}]({ref['url']})\n"
         annotated_report += "\n"
@@ -0,0 +1,295 @@
+"""
+Offline search over a local document collection.
+Builds a compressed on-disk inverted index (SQLite, zlib-compressed varint
+posting lists) over markdown, text, HTML and PDF files in a directory, ranks
+documents with BM25 and re-indexes only files that changed.
+"""
+
+import math
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from html.parser import HTMLParser
+from pathlib import Path
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "to", "was", "were", "what", "which", "with",
+}
+
+
+def tokenize(text):
+    """
+    Split text into lower-case index terms, dropping stopwords and single characters.
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def encode_varints(numbers):
+    out = bytearray()
+    for number in numbers:
+        while number >= 0x80:
+            out.append((number & 0x7F) | 0x80)
+            number >>= 7
+        out.append(number)
+    return bytes(out)
+
+
+def decode_varints(data):
+    numbers = []
+    number = 0
+    shift = 0
+    for byte in data:
+        number |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            numbers.append(number)
+            number = 0
+            shift = 0
+    return numbers
+
+
+def encode_postings(postings):
+    """
+    Compress a list of (doc_id, term_frequency) pairs sorted by doc_id.
+    Doc ids are delta-encoded so that the varints stay small.
+    """
+    numbers = []
+    previous = 0
+    for doc_id, frequency in postings:
+        numbers.extend((doc_id - previous, frequency))
+        previous = doc_id
+    return zlib.compress(encode_varints(numbers))
+
+
+def decode_postings(data):
+    numbers = decode_varints(zlib.decompress(data))
+    postings = []
+    doc_id = 0
+    for i in range(0, len(numbers), 2):
+        doc_id += numbers[i]
+        postings.append((doc_id, numbers[i + 1]))
+    return postings
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style", "noscript"):
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style", "noscript") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip and data.strip():
+            self.parts.append(data.strip())
+
+
+def html_to_text(html):
+    """
+    Return the visible text of an HTML document, one text node per line.
+    """
+    parser = _TextExtractor()
+    parser.feed(html)
+    return "\n".join(parser.parts)
+
+
+def pdf_to_text(source):
+    """
+    Extract the text of a PDF from a path or a binary file object.
+    Raises ImportError when the optional pypdf package is not installed.
+    """
+    from pypdf import PdfReader
+    return "\n".join(page.extract_text() or "" for page in PdfReader(source).pages)
+
+
+def extract_text(path):
+    """
+    Extract plain text from a markdown, text, HTML or PDF file.
+    PDF support requires the optional pypdf package.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".pdf":
+        try:
+            return pdf_to_text(path)
+        except ImportError:
+            print(f"Skipping {path}: install pypdf to index PDF files.")
+            return ""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        text = f.read()
+    if suffix in (".html", ".htm"):
+        return html_to_text(text)
+    return text
+
+
+class LocalIndex:
+    """
+    BM25 inverted index over the files of one directory.
+
+    Parameters:
+        corpus_dir (str): Directory with the documents to index (searched recursively).
+        index_path (str): Location of the SQLite index file.
+        extensions (tuple): File extensions to index.
+        k1, b (float): BM25 parameters.
+    """
+
+    def __init__(self, corpus_dir, index_path, extensions, k1=1.2, b=0.75):
+        self.corpus_dir = corpus_dir
+        self.index_path = index_path
+        self.extensions = tuple(extensions)
+        self.k1 = k1
+        self.b = b
+        self._conn = None
+        # The index is used from the search thread pool.
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.index_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "doc_id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT UNIQUE NOT NULL, "
+                "mtime REAL NOT NULL, size INTEGER NOT NULL, length INTEGER NOT NULL, terms BLOB NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS postings (term TEXT PRIMARY KEY, data BLOB NOT NULL);"
+            )
+        return self._conn
+
+    def _scan(self):
+        files = {}
+        for root, _, names in os.walk(self.corpus_dir):
+            for name in names:
+                if name.lower().endswith(self.extensions):
+                    path = os.path.abspath(os.path.join(root, name))
+                    stat = os.stat(path)
+                    files[path] = (stat.st_mtime, stat.st_size)
+        return files
+
+    def _apply_postings(self, conn, removals, additions):
+        # Each touched term's posting list is decoded and rewritten once per update.
+        for term in set(removals) | set(additions):
+            row = conn.execute("SELECT data FROM postings WHERE term = ?", (term,)).fetchone()
+            postings = decode_postings(row[0]) if row else []
+            removed = removals.get(term)
+            if removed:
+                postings = [posting for posting in postings if posting[0] not in removed]
+            # New documents always get larger doc ids than existing ones, so appending keeps the list sorted.
+            postings.extend(additions.get(term, []))
+            if postings:
+                conn.execute("INSERT OR REPLACE INTO postings (term, data) VALUES (?, ?)", (term, encode_postings(postings)))
+            else:
+                conn.execute("DELETE FROM postings WHERE term = ?", (term,))
+
+    def update(self):
+        """
+        Bring the index in line with the corpus directory, re-indexing only new,
+        changed and deleted files.
+
+        Returns:
+            dict: Counts of added, updated, removed and unchanged files.
+        """
+        with self._lock:
+            conn = self._connect()
+            files = self._scan()
+            indexed = {path: (doc_id, mtime, size, terms) for doc_id, path, mtime, size, terms
+                       in conn.execute("SELECT doc_id, path, mtime, size, terms FROM documents")}
+            counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+            removals = {}
+            additions = {}
+
+            def remove_document(doc_id, terms_blob):
+                for term in zlib.decompress(terms_blob).decode("utf-8").split("\n"):
+                    if term:
+                        removals.setdefault(term, set()).add(doc_id)
+                conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+
+            for path, (doc_id, _, _, terms) in indexed.items():
+                if path not in files:
+                    remove_document(doc_id, terms)
+                    counts["removed"] += 1
+            for path, (mtime, size) in files.items():
+                if path in indexed:
+                    doc_id, old_mtime, old_size, terms = indexed[path]
+                    if (old_mtime, old_size) == (mtime, size):
+                        counts["unchanged"] += 1
+                        continue
+                    remove_document(doc_id, terms)
+                    counts["updated"] += 1
+                else:
+                    counts["added"] += 1
+                try:
+                    tokens = tokenize(extract_text(path))
+                except Exception as e:
+                    print(f"Could not index {path}: {e}")
+                    tokens = []
+                frequencies = {}
+                for token in tokens:
+                    frequencies[token] = frequencies.get(token, 0) + 1
+                terms_blob = zlib.compress("\n".join(frequencies).encode("utf-8"))
+                cursor = conn.execute(
+                    "INSERT INTO documents (path, mtime, size, length, terms) VALUES (?, ?, ?, ?, ?)",
+                    (path, mtime, size, len(tokens), terms_blob),
+                )
+                for term, frequency in frequencies.items():
+                    additions.setdefault(term, []).append((cursor.lastrowid, frequency))
+            self._apply_postings(conn, removals, additions)
+            conn.commit()
+            return counts
+
+    def search(self, query, num_results):
+        """
+        Rank documents for a query with BM25.
+
+        Returns:
+            List[str]: file:// URLs of the best matching documents.
+        """
+        with self._lock:
+            conn = self._connect()
+            total_docs, total_length = conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents").fetchone()
+            if not total_docs:
+                return []
+            average_length = total_length / total_docs or 1
+            # doc_id -> [(idf, term frequency)] for every query term the document contains.
+            matches = {}
+            for term in set(tokenize(query)):
+                row = conn.execute("SELECT data FROM postings WHERE term = ?", (term,)).fetchone()
+                if row is None:
+                    continue
+                postings = decode_postings(row[0])
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings:
+                    matches.setdefault(doc_id, []).append((idf, frequency))
+            if not matches:
+                return []
+            lengths = dict(conn.execute(
+                f"SELECT doc_id, length FROM documents WHERE doc_id IN ({','.join('?' * len(matches))})", list(matches)
+            ).fetchall())
+            ranked = []
+            for doc_id, terms in matches.items():
+                norm = self.k1 * (1 - self.b + self.b * lengths[doc_id] / average_length)
+                score = sum(idf * frequency * (self.k1 + 1) / (frequency + norm) for idf, frequency in terms)
+                ranked.append((score, doc_id))
+            ranked.sort(reverse=True)
+            top = [doc_id for _, doc_id in ranked[:num_results]]
+            paths = dict(conn.execute(
+                f"SELECT doc_id, path FROM documents WHERE doc_id IN ({','.join('?' * len(top))})", top
+            ).fetchall())
+            return [Path(paths[doc_id]).as_uri() for doc_id in top]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
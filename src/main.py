@@ -4,6 +4,8 @@ Handles interactive prompts, process flow, and report generation.
 """
 import os
 import sys
+import json
+import argparse
 
 if __name__ == "__main__" and __package__ is None:
     # Adjust the sys.path to include the parent directory
@@ -13,24 +15,32 @@ if __name__ == "__main__" and __package__ is None:
 
 import asyncio
 
-from src.config import RESEARCH_DEPTH
+from src.config import RESEARCH_DEPTH, RUNS_DIR
+from src.checkpoint import Checkpoint
 from src.research import conduct_research
 from src.report import generate_research_report, generate_evidence_report, appendix_report
 from src.progress import ProgressManager
 from src.followups import followups
 from src.utils import split_into_three_sentences, unique_urls, ModelType
 from src.blocks_to_urls import blocks_to_urls
-from src.crawler import crawl_urls
+from src.crawler import crawl_urls, crawler_pool, crawl_scheduler, page_store, near_duplicates, fetch_stats, relevance_gate, close_crawling
+from src.context_budget import research_context
 from src.blocks_to_references import blocks_to_references
 from src.find_supporting_evidence import find_supporting_evidence
-from src.ai import get_ai_responses
+from src.ai import get_ai_responses, AIResponseError, client_manager, scheduler, response_cache, embedding_stores, close_clients, llm_flights, embedding_flights, usage_tracker
+from src.serp import serp_flights, search_backend, serp_cache, wait_for_revalidations
+from src.search_backends import close_search_backends
 
 async def get_short_description(text):
     """
     Generate a short description from the first few words of the given text.
     """
     message = [{"role":"system", "content": "Find three English words to summarize the user input so that they can be used in a filename. The three words should be separated by spaces. No special characters are allowed."},{"role": "user", "content": text}]
-    short_title = await get_ai_responses(messages=message, model=ModelType.SUMMARIZING)
+    try:
+        short_title = await get_ai_responses(messages=message, model=ModelType.SUMMARIZING, tag="title")
+    except AIResponseError as e:
+        print(f"Could not generate a short title: {e}")
+        short_title = "research"
     from datetime import datetime
     processed_title = short_title.strip().replace(" ", "_").lower()
     now = datetime.now()
@@ -38,8 +48,181 @@ async def get_short_description(text):
     final_short_description = f"{processed_title}_{dt_string}"
     return final_short_description
     
-async def main():
-    progress = ProgressManager()
+def run_report_path(report_path):
+    """
+    Return the JSON run report path that sits next to a markdown report.
+    """
+    if report_path:
+        return os.path.splitext(report_path)[0] + "_run.json"
+    from datetime import datetime
+    return os.path.join("output", f"run_{datetime.now().strftime('%Y%m%d_%H%M')}.json")
+
+async def shutdown(progress, report_path=None):
+    """
+    Release shared resources at the end of a run, report their usage and
+    write the JSON run report next to the markdown output.
+    """
+    stats = client_manager.stats()
+    cache_stats = response_cache.stats()
+    store_stats = [store.stats() for store in embedding_stores.values()]
+    scheduler_stats = scheduler.stats()
+    await wait_for_revalidations()
+    search_stats = search_backend.stats()
+    pool_stats = crawler_pool.stats()
+    crawl_stats = crawl_scheduler.stats()
+    page_stats = page_store.stats()
+    duplicate_stats = near_duplicates.stats()
+    page_fetch_stats = fetch_stats.stats()
+    relevance_stats = relevance_gate.stats()
+    context_stats = research_context.stats()
+    await close_crawling()
+    serp_cache_stats = serp_cache.stats()
+    await close_clients()
+    search_backend.close()
+    close_search_backends()
+    serp_cache.close()
+    progress.update(
+        f"OpenAI connections: {stats['requests']} requests, "
+        f"{stats['new_connections']} new, {stats['reused_connections']} reused."
+    )
+    progress.update(
+        f"LLM response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+        f"({cache_stats['hit_rate']:.0%} hit rate), {cache_stats['evictions']} evicted."
+    )
+    if store_stats:
+        progress.update(
+            f"Embedding store: {sum(s['hits'] for s in store_stats)} texts served from disk, "
+            f"{sum(s['misses'] for s in store_stats)} embedded via the API."
+        )
+    for flights in (llm_flights, embedding_flights, serp_flights):
+        flight_stats = flights.stats()
+        progress.update(f"Single-flight {flights.name}: {flight_stats['coalesced']} coalesced into {flight_stats['calls']} calls.")
+    for model, model_stats in scheduler_stats.items():
+        progress.update(
+            f"{model}: {model_stats['attempts']} attempts, {model_stats['retries']} retries, "
+            f"{model_stats['rate_limited']} rate limited, {model_stats['failures']} failed; "
+            f"avg queue wait {model_stats['avg_wait_time']:.2f}s vs service {model_stats['avg_service_time']:.2f}s, "
+            f"concurrency limit {model_stats['concurrency_limit']}."
+        )
+    progress.update(f"Search ({search_stats['backend']}): {search_stats['searches']} searches, avg {search_stats['avg_search_time']:.2f}s.")
+    progress.update(
+        f"SERP cache: {serp_cache_stats['hits']} hits, {serp_cache_stats['stale_hits']} stale hits, "
+        f"{serp_cache_stats['misses']} misses."
+    )
+    progress.update(
+        f"Crawler pool: {pool_stats['pages']} pages on {pool_stats['browser_launches']} browser launches, "
+        f"{pool_stats['utilization']:.0%} utilization, peak {pool_stats['peak_in_use']}/{pool_stats['slots']} slots, "
+        f"{pool_stats['recycles']} recycled ({pool_stats['crashes']} after a crash)."
+    )
+    progress.update(
+        f"Page store: {page_stats['fresh_hits']} fresh, {page_stats['revalidated_unchanged']} revalidated unchanged, "
+        f"{page_stats['revalidated_changed']} changed, {page_stats['misses']} not stored."
+    )
+    progress.update(
+        "Page fetches: " + (", ".join(
+            f"{path} {path_stats['pages']} (avg {path_stats['avg_latency']:.2f}s)"
+            for path, path_stats in page_fetch_stats["paths"].items()
+        ) or "none") + "; escalated to the browser: "
+        + (", ".join(f"{reason} {count}" for reason, count in page_fetch_stats["escalations"].items()) or "none") + "."
+    )
+    progress.update(
+        f"Relevance gate (threshold {relevance_stats['threshold']}): {relevance_stats['skipped']} of "
+        f"{relevance_stats['checked']} pages skipped before summarizing"
+        + (" (" + ", ".join(f"{reason} {count}" for reason, count in relevance_stats["skipped_by_reason"].items()) + ")"
+           if relevance_stats["skipped"] else "") + "."
+    )
+    progress.update(
+        f"Near-duplicates: {duplicate_stats['duplicates']} pages in {duplicate_stats['clusters']} clusters, "
+        f"{duplicate_stats['llm_calls_saved']} summarization calls saved."
+    )
+    for site, counts in context_stats["sites"].items():
+        progress.update(
+            f"Context {site} (budget {context_stats['budgets'][site]} tokens): {counts['calls']} calls, "
+            f"sources {counts['full']} in full, {counts['compressed']} compressed, {counts['dropped']} left out."
+        )
+    slowest = sorted(crawl_stats["domains"].items(), key=lambda item: item[1]["avg_latency"], reverse=True)[:3]
+    progress.update(
+        f"Crawl scheduler: {crawl_stats['fetches']} fetches over {len(crawl_stats['domains'])} domains, "
+        f"max queue depth {crawl_stats['max_queue_depth']}, avg queue wait {crawl_stats['avg_queue_wait']:.2f}s; slowest: "
+        + (", ".join(f"{domain} {stats['avg_latency']:.1f}s" for domain, stats in slowest) or "none") + "."
+    )
+    usage_by_tag = usage_tracker.summary_by_tag()
+    for tag, usage in usage_by_tag.items():
+        cached_share = usage["cached_tokens"] / usage["prompt_tokens"] if usage["prompt_tokens"] else 0.0
+        progress.update(
+            f"{tag}: {usage['calls']} calls ({usage['cache_hits']} cached), {usage['prompt_tokens']} prompt tokens "
+            f"({cached_share:.0%} prefix-cached), {usage['completion_tokens']} completion tokens, "
+            f"p50 {usage['latency_p50']:.1f}s / p90 {usage['latency_p90']:.1f}s, ~${usage['estimated_cost']:.4f}."
+        )
+
+    run_report = {
+        "usage_by_tag": usage_by_tag,
+        "usage_by_model": usage_tracker.summary(),
+        "scheduler": scheduler_stats,
+        "connections": stats,
+        "search": search_stats,
+        "crawler_pool": pool_stats,
+        "crawl_scheduler": crawl_stats,
+        "page_store": page_stats,
+        "near_duplicates": duplicate_stats,
+        "page_fetches": page_fetch_stats,
+        "relevance_gate": relevance_stats,
+        "context": context_stats,
+        "serp_cache": serp_cache_stats,
+        "response_cache": cache_stats,
+        "embedding_store": store_stats,
+        "single_flight": {flights.name: flights.stats() for flights in (llm_flights, embedding_flights, serp_flights)},
+    }
+    output_filename = run_report_path(report_path)
+    os.makedirs(os.path.dirname(output_filename), exist_ok=True)
+    with open(output_filename, "w", encoding="utf-8") as f:
+        json.dump(run_report, f, indent=2)
+    progress.update(f"Run report saved to {output_filename}")
+
+async def research_report(messages, short_desc, progress, checkpoint=None):
+    """
+    Research the question in messages and write the appendix and the final report.
+    Completed stages are restored from checkpoint instead of repeated.
+
+    Returns:
+       str: The path of the final report.
+    """
+    research_results = await conduct_research(messages=messages, depth=RESEARCH_DEPTH, progress=progress, checkpoint=checkpoint)
+    
+    progress.update("Completed gathering information...")
+    
+    appendix = await appendix_report(research_results=research_results)
+    output_filename = os.path.join("output", f"research_reference_{short_desc}.md")
+    os.makedirs("output", exist_ok=True)
+    with open(output_filename, "w", encoding="utf-8") as f:
+        f.write(appendix)
+    progress.update(f"Appendix saved to {output_filename}")
+
+    # save the appendix first before generating the final report. Sometimes the final report generation may fail.
+    # Sections are streamed into the report file as they are drafted; it is rewritten with the full report at the end.
+    output_filename = os.path.join("output", f"research_{short_desc}.md")
+    final_research_report = await generate_research_report(research_results=research_results, progress=progress,
+                                                           output_path=output_filename, checkpoint=checkpoint)
+    final_research_report += appendix
+    
+    with open(output_filename, "w", encoding="utf-8") as f:
+        f.write(final_research_report)
+    print(f"Final report saved to {output_filename}\n")
+    return output_filename
+
+async def resume(run_dir, progress):
+    """
+    Resume an interrupted research run from its run directory.
+    """
+    checkpoint = Checkpoint(run_dir)
+    run_state = checkpoint.load("run")
+    if run_state is None or run_state.get("mode") != "research":
+        print(f"No research run to resume in {run_dir}.")
+        return None
+    progress.update(f"Resuming research run {run_state['short_desc']}...")
+    return await research_report(run_state["messages"], run_state["short_desc"], progress, checkpoint)
+
+async def run(progress):
     print("Welcome to My ResearchPal!")
     print("Select an option:")
     print("1. Conduct a research on a topic")
@@ -67,26 +250,10 @@ async def main():
         progress.update("Generate short title...")
         short_desc = await get_short_description(user_initial_query)
 
-        research_results = await conduct_research(messages=messages, depth=RESEARCH_DEPTH, progress=progress)
-        
-        progress.update("Completed gathering information...")
-        
-        appendix = await appendix_report(research_results=research_results)
-        output_filename = os.path.join("output", f"research_reference_{short_desc}.md")
-        os.makedirs("output", exist_ok=True)
-        with open(output_filename, "w", encoding="utf-8") as f:
-            f.write(appendix)
-        progress.update(f"Appendix saved to {output_filename}")
-
-        # save the appendix first before generating the final report. Sometimes the final report generation may fail.
-        final_research_report = await generate_research_report(research_results=research_results, progress=progress)
-        final_research_report += appendix
-        
-        output_filename = os.path.join("output", f"research_{short_desc}.md")
-        os.makedirs("output", exist_ok=True)
-        with open(output_filename, "w", encoding="utf-8") as f:
-            f.write(final_research_report)
-        print(f"Final report saved to {output_filename}\n")
+        checkpoint = Checkpoint(os.path.join(RUNS_DIR, short_desc))
+        checkpoint.save("run", {"mode": "research", "short_desc": short_desc, "messages": messages})
+        progress.update(f"Checkpoints are saved to {checkpoint.run_dir}; resume an interrupted run with --resume {checkpoint.run_dir}")
+        return await research_report(messages, short_desc, progress, checkpoint)
         
         
     elif choice == "2": #"2. Find supporting evidence"
@@ -131,9 +298,24 @@ async def main():
             f.write(final_report)
         progress.update(f"Report saved to {output_filename}")
         print(f"Supporting evidence report saved to {output_filename}\n")
+        return output_filename
  
     else:
         print("Invalid choice. Exiting.")
 
+async def main():
+    parser = argparse.ArgumentParser(description="My ResearchPal")
+    parser.add_argument("--resume", metavar="RUN_DIR", help="resume an interrupted research run from its run directory")
+    args = parser.parse_args()
+    progress = ProgressManager()
+    report_path = None
+    try:
+        if args.resume:
+            report_path = await resume(args.resume, progress)
+        else:
+            report_path = await run(progress)
+    finally:
+        await shutdown(progress, report_path)
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
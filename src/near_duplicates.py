@@ -0,0 +1,110 @@
+"""
+Near-duplicate detection for crawled pages.
+Mirrors, syndicated copies and the same paper hosted on several sites get
+SimHash fingerprints within a few bits of each other; only the first page of
+such a cluster is summarized and the others are recorded as its alternates.
+"""
+
+import hashlib
+from src.local_search import tokenize
+
+FINGERPRINT_BITS = 64
+
+
+def simhash(tokens, shingle_size=3):
+    """
+    Return the 64-bit SimHash of a token list, built from overlapping word shingles.
+    """
+    weights = [0] * FINGERPRINT_BITS
+    shingles = {}
+    for i in range(max(1, len(tokens) - shingle_size + 1)):
+        shingle = " ".join(tokens[i:i + shingle_size])
+        shingles[shingle] = shingles.get(shingle, 0) + 1
+    for shingle, count in shingles.items():
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += count if value >> bit & 1 else -count
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex:
+    """
+    Run-wide index of page fingerprints.
+
+    Fingerprints are split into max_distance + 1 bands; two fingerprints within
+    max_distance bits agree on at least one band, so candidates are found by band lookup.
+
+    Parameters:
+        max_distance (int): Largest Hamming distance at which two pages count as duplicates.
+        min_tokens (int): Pages with fewer tokens are too short to fingerprint reliably and are never matched.
+    """
+
+    def __init__(self, max_distance, min_tokens):
+        self.max_distance = max_distance
+        self.min_tokens = min_tokens
+        self.bands = max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.bands
+        self._buckets = [{} for _ in range(self.bands)]
+        self._alternates = {}
+        self.fingerprinted = 0
+        self.duplicates = 0
+        self.calls_saved = 0
+
+    def fingerprint(self, text):
+        """
+        Return the fingerprint of a page, or None when it is too short to compare.
+        """
+        tokens = tokenize(text)
+        if len(tokens) < self.min_tokens:
+            return None
+        self.fingerprinted += 1
+        return simhash(tokens)
+
+    def _band_values(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [fingerprint >> (band * self.band_bits) & mask for band in range(self.bands)]
+
+    def match(self, fingerprint):
+        """
+        Return (url, summary_future) of the representative a fingerprint duplicates, or None.
+        """
+        for bucket, value in zip(self._buckets, self._band_values(fingerprint)):
+            for candidate, url, summary in bucket.get(value, []):
+                # Representatives whose summary failed are skipped, so their duplicates summarize themselves.
+                if summary.done() and summary.result() is None:
+                    continue
+                if hamming_distance(candidate, fingerprint) <= self.max_distance:
+                    return url, summary
+        return None
+
+    def add(self, url, fingerprint, summary):
+        """
+        Register url as the representative of its cluster. summary is a future resolving to its summary (None on failure).
+        """
+        for bucket, value in zip(self._buckets, self._band_values(fingerprint)):
+            bucket.setdefault(value, []).append((fingerprint, url, summary))
+
+    def attach(self, representative, url, saved_call):
+        """
+        Record url as an alternate of representative.
+        """
+        alternates = self._alternates.setdefault(representative, [])
+        if url not in alternates:
+            alternates.append(url)
+        self.duplicates += 1
+        self.calls_saved += saved_call
+
+    def alternates(self, url):
+        return list(self._alternates.get(url, []))
+
+    def stats(self):
+        return {
+            "fingerprinted": self.fingerprinted,
+            "clusters": len(self._alternates),
+            "duplicates": self.duplicates,
+            "llm_calls_saved": self.calls_saved,
+        }
@@ -0,0 +1,117 @@
+"""
+Persistent store of crawled pages for My ResearchPal.
+Keeps the filtered markdown (zlib-compressed), the HTTP validators (ETag and
+Last-Modified) and the page summary per canonical URL, so that unchanged
+pages can skip both rendering and re-summarization.
+"""
+
+import os
+import sqlite3
+import time
+import zlib
+
+
+class PageStore:
+    """
+    SQLite-backed page store with least-recently-used eviction.
+
+    Parameters:
+        path (str): Location of the SQLite file.
+        max_bytes (int): Upper bound for the total compressed size of stored pages.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn = None
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.changed = 0
+        self.misses = 0
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, markdown BLOB NOT NULL, size INTEGER NOT NULL, "
+                "etag TEXT, last_modified TEXT, summary TEXT, "
+                "validated_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, url):
+        """
+        Return the stored page for url as a dict, or None.
+        The dict has the keys 'markdown', 'etag', 'last_modified', 'summary' and 'age' (seconds since validation).
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT markdown, etag, last_modified, summary, validated_at FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        markdown, etag, last_modified, summary, validated_at = row
+        now = time.time()
+        conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (now, url))
+        conn.commit()
+        return {
+            "markdown": zlib.decompress(markdown).decode("utf-8"),
+            "etag": etag,
+            "last_modified": last_modified,
+            "summary": summary,
+            "age": now - validated_at,
+        }
+
+    def put(self, url, markdown, etag=None, last_modified=None, summary=None):
+        """
+        Store (or replace) a freshly fetched page.
+        """
+        conn = self._connect()
+        data = zlib.compress(markdown.encode("utf-8"))
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO pages (url, markdown, size, etag, last_modified, summary, validated_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, data, len(data), etag, last_modified, summary, now, now),
+        )
+        self._evict(conn)
+        conn.commit()
+
+    def mark_validated(self, url):
+        """
+        Record that the server confirmed the stored page is still current.
+        """
+        conn = self._connect()
+        conn.execute("UPDATE pages SET validated_at = ? WHERE url = ?", (time.time(), url))
+        conn.commit()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in conn.execute("SELECT url, size FROM pages ORDER BY accessed_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+
+    def stats(self):
+        """
+        Return how pages were served in the current run.
+        """
+        return {
+            "fresh_hits": self.fresh_hits,
+            "revalidated_unchanged": self.revalidated,
+            "revalidated_changed": self.changed,
+            "misses": self.misses,
+        }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
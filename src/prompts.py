@@ -65,6 +65,19 @@ summarize_crawl =[
     }
 ]
 
+system_prompt_summarize_chunk = """
+The input is one part of a long page scraped from the web; the part number and the total number of parts are given in the first line. Summarize this part in Markdown, keeping every fact, figure, definition, name and conclusion it contains. Use the original sentences as much as possible.
+
+If the part contains the page title, start with it as the first line. Do not add an introduction or a conclusion of your own, since the summaries of all parts will be combined into one page summary.
+""".strip()
+
+summarize_chunk =[
+    {
+        "role": "system",
+        "content": system_prompt_summarize_chunk
+    }
+]
+
 
 # ### Generate Report ###
 # system_prompt_generate_report_research = """
@@ -267,8 +280,8 @@ Based on the **Report Block**, extract key information from the **Reference Summ
 # Input Format
 
 The input consists of:
-- **Report Block**: Starts with "**Report Block**:"
-- **Reference Summary**: Follows the Report Block and starts with "**Reference Summary:**"
+- **Reference Summary**: Starts with "**Reference Summary:**"
+- **Report Block**: Follows the Reference Summary and starts with "**Report Block**:"
 
 The **Reference Summary** follows this structure:
 # [Title]
@@ -307,9 +320,6 @@ The response should be in the following format:
 
 ### **Input:**  
 ```
-**Report Block**: 
-The impact of climate change on agriculture has intensified over the past decade.  
-
 **Reference Summary**:  
 # Climate Change and Agriculture  
 **Executive Summary**  
@@ -317,6 +327,9 @@ Climate change is affecting crop yields worldwide.
 
 **Detailed Summary**  
 Studies indicate that rising temperatures and irregular rainfall patterns are major challenges for farmers. Sustainable farming practices are being promoted as a solution to mitigate risks.  Climate change has led to unpredictable weather patterns, affecting crop yields worldwide.  
+
+**Report Block**: 
+The impact of climate change on agriculture has intensified over the past decade.  
 ```  
 
 ### **Output:**  
@@ -410,13 +423,24 @@ messages_research_report_toc = [{
 }]
 
 
-def section_generation_messages(section_summary, accumulated_content):
-    section_prompt = (
-            f"Generate detailed content for at least 3000 words **only focus** on the topics in '{section_summary}'. "
-            "Do not generate a section title or any subheadings. Focus on writing long, cohesive paragraphs that flow naturally from the prior content, maintaining a consistent narrative and argumentative trajectory, do not repeat materials which have been written in previous sections."
-            "Use the `Additional context` provided by the user as your key reference. Extract key ideas, arguments, and factual evidence from these materials. Ideally including relevant quotations, paraphrases, or citations where appropriate. Ensure your response includes specific details, concrete facts, and in-depth analysis, rather than only high-level summaries, so the content is thorough and comprehensive."
-            "Here is what has been generated so far:\n\n" + accumulated_content
-        )
-    
-    messages_section_generation = [{"role": "system", "content": section_prompt}]
+system_prompt_section_generation = (
+    "You are writing one section of a research report at a time. The section topics and the content generated so far are given in the last user message. "
+    "Generate detailed content for at least 3000 words and **only focus** on the topics of the requested section. "
+    "Do not generate a section title or any subheadings. Focus on writing long, cohesive paragraphs that flow naturally from the prior content, maintaining a consistent narrative and argumentative trajectory, do not repeat materials which have been written in previous sections."
+    "Use the `Additional context` provided by the user as your key reference. Extract key ideas, arguments, and factual evidence from these materials. Ideally including relevant quotations, paraphrases, or citations where appropriate. Ensure your response includes specific details, concrete facts, and in-depth analysis, rather than only high-level summaries, so the content is thorough and comprehensive."
+)
+
+
+def section_generation_messages(section_summary, accumulated_content, reference_messages):
+    # The instructions and the reference material are identical for every section, so they form a
+    # stable prefix that the provider can cache; only the final message changes from call to call.
+    section_request = (
+        "Here is what has been generated so far:\n\n" + accumulated_content + "\n\n"
+        f"Now write the section covering the topics in '{section_summary}'."
+    )
+    messages_section_generation = (
+        [{"role": "system", "content": system_prompt_section_generation}]
+        + reference_messages
+        + [{"role": "user", "content": section_request}]
+    )
     return messages_section_generation 
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Relevance gate between crawling and summarization.
+Pages that are too short, mostly boilerplate (cookie walls, captchas, link
+farms) or whose content embedding is far from the research question are
+skipped before they cost a SUMMARIZING call.
+"""
+
+import asyncio
+import re
+import numpy as np
+from src.ai import get_embeddings, AIResponseError
+
+BOILERPLATE_PATTERN = re.compile(
+    r"cookie|consent|captcha|access denied|are you a robot|verify you are human|enable javascript"
+    r"|subscribe to (?:continue|read)|sign in to (?:continue|read)|page not found",
+    re.IGNORECASE,
+)
+MARKDOWN_LINK = re.compile(r"\[[^\]]*\]\([^)]*\)")
+
+
+def page_sample(markdown, max_tokens):
+    """
+    Return the head of a page plus evenly spaced excerpts from the rest, within max_tokens (estimated).
+    """
+    budget = max_tokens * 4
+    if len(markdown) <= budget:
+        return markdown
+    head = markdown[:budget // 2]
+    rest = markdown[budget // 2:]
+    excerpts = 4
+    size = budget // 2 // excerpts
+    step = len(rest) // excerpts
+    return head + "\n...\n" + "\n...\n".join(rest[i * step:i * step + size] for i in range(excerpts))
+
+
+def heuristic_reason(markdown, min_words):
+    """
+    Return why a page is not worth summarizing regardless of its topic, or None.
+    """
+    words = markdown.split()
+    if len(words) < min_words:
+        return "too short"
+    link_chars = sum(len(link) for link in MARKDOWN_LINK.findall(markdown))
+    if link_chars > 0.6 * len(markdown):
+        return "link farm"
+    # Short pages dominated by notices are cookie walls, captchas and error pages.
+    if len(words) < 4 * min_words and len(BOILERPLATE_PATTERN.findall(markdown)) * 20 > len(words):
+        return "boilerplate"
+    return None
+
+
+class RelevanceGate:
+    """
+    Decides which crawled pages are summarized.
+
+    Parameters:
+        threshold (float): Minimum cosine similarity between the research question and a page sample.
+        min_words (int): Pages with fewer words are skipped.
+        sample_tokens (int): Size of the page sample that is embedded.
+    """
+
+    def __init__(self, threshold, min_words, sample_tokens):
+        self.threshold = threshold
+        self.min_words = min_words
+        self.sample_tokens = sample_tokens
+        self._topics = {}
+        self.checked = 0
+        self.skipped = {}
+        self.scores = []
+
+    async def _topic_vector(self, topic):
+        # The task is stored before it is awaited, so pages checked concurrently share one topic request.
+        task = self._topics.get(topic)
+        if task is None:
+            task = asyncio.ensure_future(get_embeddings([topic], tag="relevance"))
+            self._topics[topic] = task
+        try:
+            return (await asyncio.shield(task))[0]
+        except Exception:
+            # A failed request is forgotten so that later pages try again.
+            if self._topics.get(topic) is task:
+                del self._topics[topic]
+            raise
+
+    async def check(self, topic, markdown):
+        """
+        Decide whether a page should be summarized for a research topic.
+        Embedding failures let the page through.
+
+        Returns:
+            tuple: (reason the page is skipped or None, similarity score or None).
+        """
+        self.checked += 1
+        reason = heuristic_reason(markdown, self.min_words)
+        score = None
+        if reason is None:
+            try:
+                topic_vector = await self._topic_vector(topic)
+                page_vector = (await get_embeddings([page_sample(markdown, self.sample_tokens)], tag="relevance"))[0]
+            except AIResponseError as e:
+                print(f"Relevance check failed, keeping page: {e}")
+                return None, None
+            norms = float(np.linalg.norm(topic_vector) * np.linalg.norm(page_vector)) or 1.0
+            score = float(topic_vector @ page_vector) / norms
+            self.scores.append(score)
+            if score < self.threshold:
+                reason = "off-topic"
+        if reason is not None:
+            self.skipped[reason] = self.skipped.get(reason, 0) + 1
+        return reason, score
+
+    def stats(self):
+        return {
+            "threshold": self.threshold,
+            "checked": self.checked,
+            "skipped": sum(self.skipped.values()),
+            "skipped_by_reason": dict(self.skipped),
+            "avg_score": sum(self.scores) / len(self.scores) if self.scores else 0.0,
+        }
@@ -1,42 +1,25 @@
-import asyncio
-from src.ai import get_embbded_text
+from src.ai import get_embeddings
 import numpy as np
 
-async def batched_gather(tasks, batch_size):
-    results = []
-    for i in range(0, len(tasks), batch_size):
-        batch = tasks[i:i+batch_size]
-        batch_results = await asyncio.gather(*batch)
-        results.extend(batch_results)
-    return results
-
 async def compute_embeddings(text_list):
-    # Compute embeddings for each text in the list using batching to avoid rate limits.
-    tasks = [get_embbded_text(text) for text in text_list]
-    embeddings = await batched_gather(tasks, batch_size=2000)
-    # Convert each embedding to a NumPy array for efficient similarity computation.
-    return [np.array(emb) for emb in embeddings]
+    # Embed all texts in a few batched requests; returns a float32 matrix with one row per text.
+    return await get_embeddings(text_list, tag="annotation")
+
+def normalize_rows(matrix):
+    # Scale each row to unit length so that dot products are cosine similarities.
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
 
 async def textlist_textlist_similarity(textlist_1, textlist_2):
+    if not textlist_1 or not textlist_2:
+        return np.zeros((len(textlist_1), len(textlist_2)), dtype=np.float32)
     # Pre-compute embeddings for both lists.
     embeddings_1 = await compute_embeddings(textlist_1)
     embeddings_2 = await compute_embeddings(textlist_2)
-    
+
     # Compute pairwise cosine similarities.
-    similarities = []
-    for emb1 in embeddings_1:
-        norm1 = np.linalg.norm(emb1)
-        row_similarities = []
-        for emb2 in embeddings_2:
-            norm2 = np.linalg.norm(emb2)
-            if norm1 == 0 or norm2 == 0:
-                sim = 0.0
-            else:
-                sim = emb1.dot(emb2) / (norm1 * norm2)
-            row_similarities.append(sim)
-        similarities.append(row_similarities)
-    
-    return similarities
+    return normalize_rows(embeddings_1) @ normalize_rows(embeddings_2).T
 
 
 
@@ -54,7 +37,7 @@ async def relevant_references_selector(blocks, urls_with_summaries):
         sorted_indices = sorted(range(len(block_similarities)), key=lambda j: block_similarities[j], reverse=True)
         # Select at most the top 5 most related summaries with their URLs
         top_indices = sorted_indices[:5]
-        selected_refs = [urls_with_summaries[j] for j in top_indices]
+        selected_refs = [dict(urls_with_summaries[j]) for j in top_indices]
         
         blocks_with_selected_references.append({
             "block": block,
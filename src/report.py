@@ -4,35 +4,75 @@ Uses an OpenAI SUMMARIZING_MODEL (e.g., "gpt-4o-mini") to create a detailed repo
 append reference blocks for each report chunk.
 """
 
-from src.ai import get_ai_responses
+from src.ai import get_ai_responses, stream_ai_responses
 from src.utils import ModelType, parse_toc
 from src.prompts import messages_research_report_toc, section_generation_messages
 from src.generate_annotated_report import generate_annotated_report
+from src.context_budget import research_context
 import os
 import json
 
 
-async def generate_sections(sections, idx=0, accumulated_content="", messages = None, progress=None):
+async def draft_section(section_title, section_messages, output_file=None):
+    """
+    Stream a section from the DRAFTING model, appending it to output_file as it arrives.
+
+    Returns:
+       str: The section markdown, including its heading.
+    """
+    heading = "## "+ section_title +"\n\n"
+    if output_file:
+        output_file.write(heading)
+        output_file.flush()
+    pieces = []
+    async for piece in stream_ai_responses(messages=section_messages, model=ModelType.DRAFTING, tag="section"):
+        pieces.append(piece)
+        if output_file:
+            output_file.write(piece)
+            output_file.flush()
+    if output_file:
+        output_file.write("\n\n")
+        output_file.flush()
+    return heading + "".join(pieces).strip()
+
+
+async def generate_sections(sections, idx=0, accumulated_content="", messages = None, progress=None, output_file=None, drafted=None, on_drafted=None):
+        """
+        drafted (list): Sections already drafted (e.g. restored from a checkpoint); newly drafted ones are appended.
+        on_drafted: Called after each newly drafted section.
+        """
         if idx >= len(sections):
             return ""
+        if drafted is None:
+            drafted = []
         section_summary = sections[idx]
-        # Create a prompt that includes the accumulated content to ensure smooth flow.
-        if progress: 
-            progress.update(f"Generating section {idx + 1}/{len(sections)}: {section_summary}")
-        # Extract the title from the first line of the section summary
-        section_title = section_summary.split("\n")[0].strip()  
-        section_messages = section_generation_messages(section_summary, accumulated_content) + messages
-
-        section_content = "## "+ section_title +"\n\n" + await get_ai_responses(messages=section_messages, model=ModelType.DRAFTING)
+        if idx < len(drafted):
+            # Restored sections are written out again but not redrafted.
+            section_content = drafted[idx]
+            if output_file:
+                output_file.write(section_content + "\n\n")
+                output_file.flush()
+        else:
+            # Create a prompt that includes the accumulated content to ensure smooth flow.
+            if progress: 
+                progress.update(f"Generating section {idx + 1}/{len(sections)}: {section_summary}")
+            # Extract the title from the first line of the section summary
+            section_title = section_summary.split("\n")[0].strip()  
+            section_messages = section_generation_messages(section_summary, accumulated_content, messages)
+
+            section_content = await draft_section(section_title, section_messages, output_file=output_file)
+            drafted.append(section_content)
+            if on_drafted:
+                on_drafted()
         # Append current section to the accumulated content.
        
         new_accumulated_content = accumulated_content +  section_content + "\n\n"
         # Recursively generate the remaining sections with the updated context.
-        remaining_content = await generate_sections(sections, idx + 1, new_accumulated_content, messages=messages, progress=progress)
+        remaining_content = await generate_sections(sections, idx + 1, new_accumulated_content, messages=messages, progress=progress, output_file=output_file, drafted=drafted, on_drafted=on_drafted)
         return section_content + "\n\n" + remaining_content
 
 
-async def generate_research_report(research_results=None, progress=None):
+async def generate_research_report(research_results=None, progress=None, output_path=None, checkpoint=None):
     """
     Generate a base report from the research question and key learnings.
     (A real implementation would call the OpenAI SUMMARIZING_MODEL.)
@@ -40,11 +80,25 @@ async def generate_research_report(research_results=None, progress=None):
     Parameters:
        user_query (str): Original research question.
        learnings (List[str]): Extracted learning points.
+       output_path (str): Optional markdown file that sections are streamed into while
+                          they are drafted, so partial output survives a failure.
+       checkpoint (Checkpoint): Optional run directory state; the ToC, each drafted section and
+                                the annotations are saved to it, and restored instead of regenerated.
     
     Returns:
        str: A markdown-formatted report.
     """
     messages = research_results.get("messages", [])
+    urls = research_results.get("visited_urls", [])
+    urls_summaries = research_results.get("urls_summaries", [])
+    # The question and follow-up answers; the learnings appended after them are sent as budgeted sources instead.
+    question = messages[:4]
+    topic = "\n".join(message["content"] for message in question if message["role"] == "user")
+    state = (checkpoint.load("report") if checkpoint else None) or {"toc": None, "sections": [], "annotations": {}}
+
+    def save_state():
+        if checkpoint:
+            checkpoint.save("report", state)
 
    #   ## debug setting begin ##
    #  import json
@@ -68,10 +122,16 @@ async def generate_research_report(research_results=None, progress=None):
         progress.update(f"Generating base report...")  
     
     
-    if progress:
-        progress.update(f"Generating Table of Contents...")  
-    toc_messages = messages_research_report_toc + messages    
-    table_of_contents = await get_ai_responses(messages=toc_messages, model=ModelType.REASONING)
+    if state["toc"] is None:
+        if progress:
+            progress.update(f"Generating Table of Contents...")  
+        toc_context = await research_context.fit("toc", urls_summaries, topic)
+        toc_messages = messages_research_report_toc + question + [{"role": "user", "content": f"Additional context: {toc_context}"}]
+        state["toc"] = await get_ai_responses(messages=toc_messages, model=ModelType.REASONING, tag="toc")
+        save_state()
+    elif progress:
+        progress.update(f"Table of Contents restored; {len(state['sections'])} sections already drafted.")
+    table_of_contents = state["toc"]
     
     
     # Parse the table of contents to extract the title and sections.
@@ -82,13 +142,19 @@ async def generate_research_report(research_results=None, progress=None):
         progress.update(f"Generating Sections ...")  
 
     # Generate the report body by recursively processing all sections.
-    reference_messages = messages[4:]
-    report_body = await generate_sections(sections, messages= reference_messages, progress=progress)
+    # The sources are chosen once, against the question, so every section shares the same cacheable prefix.
+    section_context = await research_context.fit("section", urls_summaries, topic)
+    reference_messages = [{"role": "user", "content": f"Additional context: {section_context}"}]
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as output_file:
+            output_file.write("# "+ title + "\n\n")
+            report_body = await generate_sections(sections, messages= reference_messages, progress=progress, output_file=output_file,
+                                                  drafted=state["sections"], on_drafted=save_state)
+    else:
+        report_body = await generate_sections(sections, messages= reference_messages, progress=progress,
+                                              drafted=state["sections"], on_drafted=save_state)
     report = "# "+ title + "\n\n" + report_body
     
-
-    urls = research_results.get("visited_urls", [])
-    urls_summaries = research_results.get("urls_summaries", [])
     
     # Save the base report and urls_summaries to a file for debugging purposes.
 
@@ -115,7 +181,8 @@ async def generate_research_report(research_results=None, progress=None):
 
     if progress:
         progress.update(f"Generating annotated report...")  
-    annotated_report = await generate_annotated_report(report, urls_summaries, progress=progress)   
+    annotated_report = await generate_annotated_report(report, urls_summaries, progress=progress,
+                                                       annotations=state["annotations"], on_annotated=save_state)   
 
     if progress:
         progress.update(f"Generating the final research report...")    
@@ -171,5 +238,8 @@ async def appendix_report(research_results=None):
          url = url_summary['url']
          summary = url_summary['summary']
          appendix += "\n---\n" + "\n---\n" + f"### [{url}]({url})\n\n{summary}" + "\n\n"
+         alternates = url_summary.get("alternates", [])
+         if alternates:
+             appendix += "Also available at: " + ", ".join(f"[{alternate}]({alternate})" for alternate in alternates) + "\n\n"
 
     return appendix
\ No newline at end of file
@@ -3,81 +3,411 @@ Core research functionality.
 Supports both recursive deep research and supporting evidence collection.
 
 Functions:
-- conduct_research: recursively gathers learnings using SERP queries, web crawling, and OpenAI.
+- conduct_research: gathers learnings from a frontier of SERP queries, web crawling, and OpenAI.
 - find_supporting_evidence: extracts supporting references for given text chunks.
 """
 
 import asyncio
-from src.config import RESEARCH_DEPTH, MAX_REFERENCE_PER_PARAGRAPH
-from src.serp import generate_serp_queries, search_serp
-from src.crawler import crawl_urls
+import heapq
+import math
+import numpy as np
+from src.config import (
+    RESEARCH_DEPTH, MAX_REFERENCE_PER_PARAGRAPH, RESEARCH_CRAWL_QUORUM, RESEARCH_CRAWL_DEADLINE,
+    RESEARCH_WORKERS, RESEARCH_MAX_QUERIES, RESEARCH_MAX_PAGES, RESEARCH_QUERIES_PER_BRANCH,
+    RESEARCH_NOVELTY_ENABLED, RESEARCH_NOVELTY_STOP, RESEARCH_NOVELTY_EXTEND, RESEARCH_MAX_EXTENDED_DEPTH,
+)
+from src.ai import get_embeddings, AIResponseError
+from src.serp import generate_serp_queries, search_serp, normalize_query
+from src.crawler import crawl_urls, near_duplicates
+from src.urls import canonicalize_url
 from src.extract_learnings import extract_learnings
+from src.context_budget import research_context, format_sources
 from src.prompts import generate_serp_research
 
-async def conduct_research(messages, depth=RESEARCH_DEPTH, progress=None, visited_urls=None,urls_summaries=None):
+async def collect_crawls(stream, total, quorum=RESEARCH_CRAWL_QUORUM, deadline=RESEARCH_CRAWL_DEADLINE):
     """
-    Recursively conduct research.
-    1. Generate follow-up questions (if not provided).
-    2. Generate SERP queries using the provided query and follow-up responses.
-    3. Search each query to get URLs, filtering out URLs that have already been visited.
-    4. Crawl new URLs and extract learnings.
-    5. If depth > 1, use current learnings as new follow-up info and repeat.
+    Consume a CrawlStream until a quorum of pages has been summarized, the
+    deadline has passed or every page is done, whichever comes first.
+
+    Parameters:
+       stream (CrawlStream): Results of a query's crawls in completion order.
+       total (int): Number of URLs being crawled.
+       quorum (float): Share of the URLs that must succeed before moving on.
+       deadline (float): Seconds to wait for the quorum.
+
+    Returns:
+       List[dict]: The crawl results received so far.
+    """
+    loop = asyncio.get_running_loop()
+    expires = loop.time() + deadline
+    needed = math.ceil(total * quorum)
+    results = []
+    succeeded = 0
+    while succeeded < needed:
+        try:
+            result = await asyncio.wait_for(anext(stream), timeout=max(0.0, expires - loop.time()))
+        except (StopAsyncIteration, asyncio.TimeoutError):
+            break
+        results.append(result)
+        succeeded += bool(result.get("success"))
+    return results
+
+class ResearchEngine:
+    """
+    Work-queue research engine. A priority frontier holds (depth, sequence,
+    query, parent sources) items; workers take the shallowest item, search,
+    crawl and summarize its pages, and push follow-up queries derived from
+    the new learnings, until the frontier is empty or the query and page
+    budgets are spent. Each item's novelty, how far its new summaries are
+    from everything already known, decides whether its branch is followed:
+    stale branches stop early, novel ones continue past max_depth.
+
+    Parameters:
+       messages (list): The research question and follow-up answers; learnings are appended as they arrive.
+       max_depth (int): Deepest level follow-up queries are generated for.
+       progress (ProgressManager): Progress manager instance (optional).
+       max_queries (int): Total number of search queries the run may issue.
+       max_pages (int): Total number of pages the run may crawl.
+       checkpoint (Checkpoint): Where the engine saves its state after each query; a saved state is resumed.
+       novelty (bool): Follow branches by novelty; without it every branch is followed up to max_depth.
+    """
+
+    def __init__(self, messages, max_depth=RESEARCH_DEPTH, progress=None,
+                 max_queries=RESEARCH_MAX_QUERIES, max_pages=RESEARCH_MAX_PAGES, checkpoint=None,
+                 novelty=RESEARCH_NOVELTY_ENABLED):
+        self.messages = messages
+        # Follow-up queries are generated from the question plus one branch's learnings, not the whole run's.
+        self.question = list(messages)
+        self.topic = "\n".join(message["content"] for message in messages if message["role"] == "user")
+        self.max_depth = max_depth
+        self.progress = progress
+        self.max_queries = max_queries
+        self.max_pages = max_pages
+        self.frontier = []
+        self.seen_queries = set()
+        self.queries_planned = 0
+        self.pages_planned = 0
+        # Canonical forms of the claimed URLs, for deduplication, and the claimed URLs themselves.
+        self._visited_keys = set()
+        self.visited_urls = []
+        self.urls_summaries = []
+        self.late_crawls = []
+        # URL of each late crawl, by task.
+        self.late_urls = {}
+        # Items being explored, with the (canonical, original) URLs they claimed and whether
+        # their results are recorded, by sequence number.
+        self.in_progress = {}
+        self.checkpoint = checkpoint
+        self.novelty = novelty
+        # Unit embeddings of the summaries known so far, one row per summary.
+        self.known = None
+        # (depth, novelty) of each explored item.
+        self.novelty_scores = []
+        self.done = False
+        self._sequence = 0
+        self._active = 0
+        self._changed = None
+
+    def report(self, message):
+        if self.progress:
+            self.progress.update(message)
+
+    def push(self, query, parent_sources, depth):
+        """
+        Add a query to the frontier unless it was already planned or the query budget is spent.
+        """
+        key = normalize_query(query)
+        if not key or key in self.seen_queries or self.queries_planned >= self.max_queries:
+            return False
+        self.seen_queries.add(key)
+        self.queries_planned += 1
+        self._sequence += 1
+        heapq.heappush(self.frontier, (depth, self._sequence, query, parent_sources))
+        return True
+
+    async def plan(self, context=None):
+        """
+        Generate search queries from the question plus the context of the branch they follow up.
+        """
+        messages = generate_serp_research + self.question
+        if context:
+            messages = messages + [{"role": "user", "content": f"Additional context: {context}"}]
+        return await generate_serp_queries(messages)
+
+    async def embed_summaries(self, summaries):
+        """
+        Return unit embeddings of summaries, or None if embedding fails.
+        """
+        try:
+            embeddings = await get_embeddings(summaries, tag="novelty")
+        except AIResponseError as e:
+            print(f"Novelty embedding failed: {e}")
+            return None
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+    async def measure_novelty(self, depth, sources):
+        """
+        Return how much the sources add to what is known: the mean, over their summaries, of one minus
+        the cosine similarity to the closest known summary (1.0 while nothing is known). The summaries
+        become known. Returns None when novelty is disabled or cannot be measured.
+        """
+        if not self.novelty or not sources:
+            return None
+        embeddings = await self.embed_summaries([source["summary"] for source in sources])
+        if embeddings is None:
+            return None
+        # Compared and recorded without awaiting, so concurrent items see each other's summaries.
+        if self.known is None:
+            novelty = 1.0
+            self.known = embeddings
+        else:
+            novelty = float(np.mean(1.0 - (embeddings @ self.known.T).max(axis=1)))
+            self.known = np.vstack([self.known, embeddings])
+        self.novelty_scores.append((depth, novelty))
+        return novelty
+
+    def follow_up(self, depth, novelty):
+        """
+        Decide whether an item's branch is followed up with deeper queries.
+        """
+        if novelty is None:
+            return depth < self.max_depth
+        if novelty < RESEARCH_NOVELTY_STOP:
+            return False
+        if depth < self.max_depth:
+            return True
+        return novelty >= RESEARCH_NOVELTY_EXTEND and depth < RESEARCH_MAX_EXTENDED_DEPTH
+
+    def novelty_by_depth(self):
+        """
+        Return {depth: (average novelty, number of items)} of the explored items.
+        """
+        scores = {}
+        for depth, novelty in self.novelty_scores:
+            scores.setdefault(depth, []).append(novelty)
+        return {depth: (sum(values) / len(values), len(values)) for depth, values in sorted(scores.items())}
+
+    def claim_urls(self, urls, claimed=None):
+        """
+        Return the URLs not crawled yet, compared in canonical form so that variants of one page are crawled once,
+        within the page budget. (canonical form, URL) pairs of the claimed URLs are added to claimed.
+        """
+        new_urls = []
+        for url in urls:
+            key = canonicalize_url(url)
+            if key in self._visited_keys:
+                continue
+            if self.pages_planned >= self.max_pages:
+                break
+            self._visited_keys.add(key)
+            self.visited_urls.append(url)
+            self.pages_planned += 1
+            new_urls.append(url)
+            if claimed is not None:
+                claimed.append((key, url))
+        return new_urls
+
+    async def explore(self, depth, query, parent_sources, entry=None):
+        """
+        Search one query, crawl and summarize its new pages and plan follow-up queries from what was learned.
+        entry is the item's in_progress record.
+        """
+        new_urls = self.claim_urls(await search_serp(query), entry["claimed"] if entry is not None else None)
+        self.report(f"Depth {depth}: '{query}' found {len(new_urls)} new URLs.")
+        if not new_urls:
+            return
+        # Crawl the new URLs and move on once a quorum of pages is summarized or the deadline passes.
+        stream = crawl_urls(new_urls, as_completed=True, topic=self.topic)
+        crawl_results = await collect_crawls(stream, len(new_urls))
+        skipped = sum(1 for result in crawl_results if result.get("skipped"))
+        if skipped:
+            self.report(f"Skipped {skipped} irrelevant or boilerplate pages before summarizing.")
+        learnings = await extract_learnings(crawl_results)
+        # Near-duplicates are attached to their representative at the end of the run.
+        sources = [{"url": result["url"], "summary": result["summary"]}
+                   for result in crawl_results if result.get("success") and not result.get("duplicate_of")]
+
+        # The item's results are recorded together, without awaiting, so a checkpoint never holds half an item,
+        # and before the optional novelty and planning steps, so their failure loses no summaries.
+        self.late_crawls.extend(stream.pending())
+        self.late_urls.update(zip(stream.pending(), stream.pending_urls()))
+        self.urls_summaries.extend(sources)
+        if learnings:
+            self.messages.append({"role": "user", "content": f"Additional context: {learnings}"})
+        if entry is not None:
+            entry["recorded"] = True
+
+        novelty = await self.measure_novelty(depth, sources)
+        follow_up = self.follow_up(depth, novelty)
+        if novelty is not None:
+            decision = ""
+            if novelty < RESEARCH_NOVELTY_STOP:
+                decision = ", branch stopped"
+            elif follow_up and depth >= self.max_depth:
+                decision = ", extended past the maximum depth"
+            self.report(f"Depth {depth}: '{query}' novelty {novelty:.2f}{decision}.")
+        # Planning is skipped once the query budget is spent, since nothing it returns could be queued.
+        if not learnings or not follow_up or self.queries_planned >= self.max_queries:
+            return
+        # Follow-ups are planned from the branch's sources that fit the SERP budget, and inherit them.
+        branch_sources = await research_context.select("serp", (parent_sources or []) + sources, query)
+        queries = await self.plan(format_sources(branch_sources))
+        for follow_up_query in queries[:RESEARCH_QUERIES_PER_BRANCH]:
+            self.push(follow_up_query, branch_sources, depth + 1)
+
+    async def worker(self):
+        while True:
+            async with self._changed:
+                # Stop once nothing is queued and no running item can add more.
+                await self._changed.wait_for(lambda: self.frontier or self._active == 0)
+                if not self.frontier:
+                    return
+                item = heapq.heappop(self.frontier)
+                depth, sequence, query, parent_sources = item
+                self.in_progress[sequence] = {"item": item, "claimed": [], "recorded": False}
+                self._active += 1
+            try:
+                await self.explore(depth, query, parent_sources, self.in_progress[sequence])
+            except Exception as e:
+                print(f"Research on '{query}' failed: {e}")
+            # An interrupted item (e.g. Ctrl+C) stays in progress, so checkpoints keep it queued for a resume.
+            async with self._changed:
+                del self.in_progress[sequence]
+                self._active -= 1
+                self.save_checkpoint()
+                self._changed.notify_all()
+
+    def state(self):
+        """
+        Return the engine state as JSON-serializable data. Items still being explored are saved
+        back into the frontier without their claimed URLs, unless their results are already
+        recorded (their follow-ups are then lost), and late crawls as URLs to crawl again.
+        """
+        released = [entry for entry in self.in_progress.values() if not entry["recorded"]]
+        claimed = {key for entry in released for key, _ in entry["claimed"]}
+        claimed_urls = {url for entry in released for _, url in entry["claimed"]}
+        return {
+            "done": self.done,
+            "messages": self.messages,
+            "visited_keys": sorted(self._visited_keys - claimed),
+            "visited_urls": [url for url in self.visited_urls if url not in claimed_urls],
+            "urls_summaries": self.urls_summaries,
+            "frontier": [list(item) for item in self.frontier] + [list(entry["item"]) for entry in released],
+            "seen_queries": sorted(self.seen_queries),
+            "queries_planned": self.queries_planned,
+            "pages_planned": self.pages_planned - len(claimed),
+            "late_urls": list(self.late_urls.values()),
+            "sequence": self._sequence,
+            "novelty_scores": [list(score) for score in self.novelty_scores],
+        }
+
+    def restore(self, state):
+        self.done = state["done"]
+        self.messages[:] = state["messages"]
+        self._visited_keys = set(state["visited_keys"])
+        self.visited_urls = state["visited_urls"]
+        self.urls_summaries = state["urls_summaries"]
+        self.frontier = [tuple(item) for item in state["frontier"]]
+        heapq.heapify(self.frontier)
+        self.seen_queries = set(state["seen_queries"])
+        self.queries_planned = state["queries_planned"]
+        self.pages_planned = state["pages_planned"]
+        self._sequence = state["sequence"]
+        self.novelty_scores = [tuple(score) for score in state.get("novelty_scores", [])]
+        # Late crawls cannot be saved; their pages are crawled again (cheaply, through the page store).
+        if state["late_urls"]:
+            stream = crawl_urls(state["late_urls"], as_completed=True, topic=self.topic)
+            self.late_crawls.extend(stream.pending())
+            self.late_urls.update(zip(stream.pending(), stream.pending_urls()))
+
+    def save_checkpoint(self):
+        if self.checkpoint is not None:
+            self.checkpoint.save("research", self.state())
+
+    def results(self):
+        return {"messages": self.messages,
+                "visited_urls": self.visited_urls,
+                "urls_summaries": self.urls_summaries}
+
+    async def run(self, workers=RESEARCH_WORKERS):
+        """
+        Run the research to completion.
+
+        Returns:
+           dict: { "messages": updated messages,
+                   "visited_urls": List[str],
+                   "urls_summaries": List[dict] }
+        """
+        self._changed = asyncio.Condition()
+        saved = self.checkpoint.load("research") if self.checkpoint is not None else None
+        if saved is not None:
+            self.restore(saved)
+            if self.done:
+                self.report("Research restored from checkpoint.")
+                return self.results()
+            self.report(f"Resuming research: {len(self.frontier)} queued queries, {len(self.urls_summaries)} sources so far.")
+            if self.novelty and self.urls_summaries:
+                self.known = await self.embed_summaries([url_summary["summary"] for url_summary in self.urls_summaries])
+        elif not self.frontier:
+            for query in await self.plan():
+                self.push(query, None, 1)
+            self.save_checkpoint()
+        self.report(f"Researching with {workers} workers, up to {self.max_queries} queries and {self.max_pages} pages...")
+        await asyncio.gather(*(self.worker() for _ in range(workers)))
+
+        # Pages that missed their query's quorum still feed the report.
+        if self.late_crawls:
+            self.report(f"Waiting for {len(self.late_crawls)} late pages...")
+            self.urls_summaries.extend(
+                {"url": result["url"], "summary": result["summary"]}
+                for result in await asyncio.gather(*self.late_crawls) if result.get("success") and not result.get("duplicate_of")
+            )
+            self.late_crawls = []
+            self.late_urls = {}
+        for url_summary in self.urls_summaries:
+            alternates = near_duplicates.alternates(url_summary["url"])
+            if alternates:
+                url_summary["alternates"] = alternates
+        self.report(f"Research finished: {self.queries_planned} queries, {self.pages_planned} pages, "
+                    f"{len(self.urls_summaries)} sources.")
+        if self.novelty_scores:
+            self.report("Novelty by depth: " + ", ".join(
+                f"depth {depth} {novelty:.2f} ({count} queries)" for depth, (novelty, count) in self.novelty_by_depth().items()
+            ) + ".")
+        self.done = True
+        self.save_checkpoint()
+        return self.results()
+
+async def conduct_research(messages, depth=RESEARCH_DEPTH, progress=None, workers=RESEARCH_WORKERS,
+                           max_queries=RESEARCH_MAX_QUERIES, max_pages=RESEARCH_MAX_PAGES, checkpoint=None):
+    """
+    Conduct research with a ResearchEngine.
+    1. Generate SERP queries from the research question and follow-up answers.
+    2. Workers search queries from the frontier, shallowest first, skipping already visited URLs.
+    3. New URLs are crawled and summarized, and their learnings appended to messages.
+    4. Below the maximum depth, each query's learnings seed up to RESEARCH_QUERIES_PER_BRANCH follow-up queries.
+       Branches whose new summaries add little to what is known stop early; branches that stay novel
+       continue up to RESEARCH_MAX_EXTENDED_DEPTH.
     
     Parameters:
        messages: original research question and follow-up answers.
-       depth (int): Current recursion depth.
+       depth (int): Maximum research depth for branches that are not extended for their novelty.
        progress (ProgressManager): Progress manager instance (optional).
-       visited_urls (set): Set of URLs that have already been crawled.
+       workers (int): Number of queries explored concurrently.
+       max_queries (int): Total query budget.
+       max_pages (int): Total page budget.
+       checkpoint (Checkpoint): Run directory state to save after each query and resume from.
     
     Returns:
        dict: { "messages": updated messages,
-               "learnings": List[str],
                "visited_urls": List[str],
-               "crawl_results": List[dict] }
+               "urls_summaries": List[dict] }
     """
-    if visited_urls is None:
-        visited_urls = set()
-    if urls_summaries is None:
-        urls_summaries = []
-    if progress:
-        progress.update(f"Conducting research at depth {depth}...")
-
-    
-    serp_queries = await generate_serp_queries(generate_serp_research+messages)
-
-    # Gather new URLs from search results, skipping already visited ones.
-    new_urls = set()
-    for query in serp_queries:
-        urls = await search_serp(query)
-        for url in urls:
-            if url not in visited_urls:
-                new_urls.add(url)
-                visited_urls.add(url)
-    unique_urls = list(new_urls)
-    
-    if progress:
-        progress.update(f"Found {len(unique_urls)} new unique URLs for research.")
-
-    # Crawl the new URLs.
-    crawl_results = await crawl_urls(unique_urls)
-    # Extend the urls_summaries with each successful crawl's result.
-    urls_summaries.extend(
-       {"url": result["url"], "summary": result["summary"]}
-       for result in crawl_results if result.get("success")
-   )
-    # Extract learnings.
-    current_learnings = await extract_learnings(crawl_results)
-
-    # Append additional context for further exploration.
-    messages.append({"role": "user", "content": f"Additional context: {current_learnings}"})
-    
-    # Recursive exploration.
-    if depth > 1:
-        await conduct_research(messages=messages, depth=depth-1, progress=progress, visited_urls=visited_urls, urls_summaries=urls_summaries)
-
-    return {"messages": messages,
-            "visited_urls": list(visited_urls),
-            "urls_summaries": urls_summaries}
+    engine = ResearchEngine(messages, max_depth=depth, progress=progress, max_queries=max_queries, max_pages=max_pages,
+                            checkpoint=checkpoint)
+    return await engine.run(workers)
 
 # async def find_supporting_evidence(input_text, progress=None):
 #     """
@@ -0,0 +1,227 @@
+"""
+Request scheduling for OpenAI API calls.
+Provides per-model RPM/TPM token buckets, an AIMD concurrency limit that adapts
+to observed latency and rate limiting, and retries with jittered exponential backoff.
+"""
+
+import asyncio
+import random
+import time
+from openai import RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
+
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+class TokenBucket:
+    """
+    A token bucket refilled continuously at rate_per_minute, holding at most rate_per_minute tokens.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount):
+        # A request larger than the bucket could never be served; let it through once the bucket is full.
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def consume(self, amount):
+        """
+        Debit (or credit, for a negative amount) tokens without waiting, e.g. to
+        correct an estimate once the real usage is known.
+        """
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AdaptiveConcurrency:
+    """
+    An additive-increase / multiplicative-decrease limit on in-flight requests.
+
+    The limit grows by about one slot per limit's worth of successful calls, halves
+    on a rate-limit error and shrinks by 10% when a call is much slower than usual.
+    """
+
+    def __init__(self, initial, minimum, maximum, latency_factor=3.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self.in_flight = 0
+        self.latency_ewma = None
+        self._condition = None
+
+    @property
+    def condition(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency=None, rate_limited=False):
+        async with self.condition:
+            self.in_flight -= 1
+            if rate_limited:
+                self.limit = max(self.minimum, self.limit / 2)
+            elif latency is not None:
+                if self.latency_ewma is not None and latency > self.latency_factor * self.latency_ewma:
+                    self.limit = max(self.minimum, self.limit * 0.9)
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self.latency_ewma = latency if self.latency_ewma is None else 0.9 * self.latency_ewma + 0.1 * latency
+            self.condition.notify_all()
+
+
+class ModelState:
+    """
+    Rate limits, concurrency limit and metrics for one model.
+    """
+
+    def __init__(self, rpm, tpm, initial_concurrency, min_concurrency, max_concurrency):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, min_concurrency, max_concurrency)
+        self.attempts = 0
+        self.failures = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.service_time = 0.0
+        self.max_service_time = 0.0
+
+    def record(self, wait, service):
+        self.attempts += 1
+        self.wait_time += wait
+        self.max_wait_time = max(self.max_wait_time, wait)
+        self.service_time += service
+        self.max_service_time = max(self.max_service_time, service)
+
+
+class Scheduler:
+    """
+    Central scheduler that every OpenAI request goes through.
+
+    Parameters:
+        rate_limits (dict): Model name -> {"rpm": int, "tpm": int}.
+        default_rate_limit (dict): Limits for models missing from rate_limits.
+        initial_concurrency, min_concurrency, max_concurrency (int): Bounds of the adaptive concurrency limit.
+        max_retries (int): Retries for rate-limit, timeout, connection and server errors.
+        backoff_base, backoff_cap (float): Exponential backoff parameters in seconds.
+    """
+
+    def __init__(self, rate_limits, default_rate_limit, initial_concurrency, min_concurrency,
+                 max_concurrency, max_retries, backoff_base, backoff_cap):
+        self.rate_limits = rate_limits
+        self.default_rate_limit = default_rate_limit
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.models = {}
+
+    def _state(self, model):
+        if model not in self.models:
+            limits = self.rate_limits.get(model, self.default_rate_limit)
+            self.models[model] = ModelState(limits["rpm"], limits["tpm"], self.initial_concurrency,
+                                            self.min_concurrency, self.max_concurrency)
+        return self.models[model]
+
+    def _backoff(self, attempt, error):
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        # Full jitter: a random delay up to the exponential bound spreads out retries from concurrent callers.
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    async def run(self, model, estimated_tokens, call, usage_tokens=None):
+        """
+        Run call() under the model's rate and concurrency limits, retrying transient errors.
+
+        Parameters:
+            model (str): The model name used to select limits.
+            estimated_tokens (int): Estimated total tokens of the request, charged to the TPM bucket.
+            call: A zero-argument function returning the API coroutine.
+            usage_tokens: Optional function mapping the response to the real token usage.
+
+        Returns:
+            The response returned by call().
+        """
+        state = self._state(model)
+        for attempt in range(self.max_retries + 1):
+            submitted = time.monotonic()
+            await state.requests.acquire(1)
+            await state.tokens.acquire(estimated_tokens)
+            await state.concurrency.acquire()
+            started = time.monotonic()
+            try:
+                response = await call()
+            except RETRYABLE_ERRORS as e:
+                rate_limited = isinstance(e, RateLimitError)
+                await state.concurrency.release(rate_limited=rate_limited)
+                state.record(started - submitted, time.monotonic() - started)
+                state.rate_limited += rate_limited
+                # Exhausted quota will not recover by waiting.
+                if attempt == self.max_retries or getattr(e, "code", None) == "insufficient_quota":
+                    state.failures += 1
+                    raise
+                state.retries += 1
+                await asyncio.sleep(self._backoff(attempt, e))
+                continue
+            except BaseException:
+                await state.concurrency.release()
+                state.record(started - submitted, time.monotonic() - started)
+                state.failures += 1
+                raise
+            service = time.monotonic() - started
+            await state.concurrency.release(latency=service)
+            state.record(started - submitted, service)
+            if usage_tokens is not None:
+                actual = usage_tokens(response)
+                if actual is not None:
+                    state.tokens.consume(actual - estimated_tokens)
+            return response
+
+    def stats(self):
+        """
+        Return per-model queue wait versus service time and retry counters.
+        """
+        stats = {}
+        for model, state in self.models.items():
+            attempts = state.attempts or 1
+            stats[model] = {
+                "attempts": state.attempts,
+                "failures": state.failures,
+                "retries": state.retries,
+                "rate_limited": state.rate_limited,
+                "avg_wait_time": state.wait_time / attempts,
+                "max_wait_time": state.max_wait_time,
+                "avg_service_time": state.service_time / attempts,
+                "max_service_time": state.max_service_time,
+                "concurrency_limit": int(state.concurrency.limit),
+            }
+        return stats
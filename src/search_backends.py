@@ -0,0 +1,133 @@
+"""
+Search backends used by search_serp.
+Blocking search libraries run in a bounded thread pool so that they never block
+the event loop, and each backend limits its own concurrency and request pacing.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.config import (
+    SEARCH_THREAD_POOL_SIZE, SEARCH_MAX_CONCURRENCY, SEARCH_MIN_INTERVAL,
+    LOCAL_CORPUS_DIR, LOCAL_CORPUS_EXTENSIONS, LOCAL_INDEX_PATH,
+)
+from src.local_search import LocalIndex
+
+# Shared by all blocking backends.
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_THREAD_POOL_SIZE, thread_name_prefix="search")
+
+
+class SearchBackend:
+    """
+    Base class for search backends.
+
+    Parameters:
+        max_concurrency (int): Maximum number of searches running at once.
+        min_interval (float): Minimum number of seconds between the start of two searches.
+    """
+
+    name = "base"
+    # Whether search_serp may cache this backend's results.
+    cacheable = True
+
+    def __init__(self, max_concurrency=SEARCH_MAX_CONCURRENCY, min_interval=SEARCH_MIN_INTERVAL):
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self._semaphore = None
+        self._pacing_lock = None
+        self._next_start = 0.0
+        self.searches = 0
+        self.search_time = 0.0
+
+    async def _pace(self):
+        if self._pacing_lock is None:
+            self._pacing_lock = asyncio.Lock()
+        async with self._pacing_lock:
+            delay = self._next_start - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_start = time.monotonic() + self.min_interval
+
+    async def search(self, query, num_results, region):
+        """
+        Search for a query under the backend's concurrency and pacing limits.
+
+        Returns:
+            List[str]: Result URLs.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            await self._pace()
+            started = time.monotonic()
+            try:
+                return await self._search(query, num_results, region)
+            finally:
+                self.searches += 1
+                self.search_time += time.monotonic() - started
+
+    async def _search(self, query, num_results, region):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "searches": self.searches,
+            "avg_search_time": self.search_time / self.searches if self.searches else 0.0,
+        }
+
+
+class GoogleSearchBackend(SearchBackend):
+    """
+    Google search through the blocking googlesearch package, run in the search thread pool.
+    """
+
+    name = "google"
+
+    async def _search(self, query, num_results, region):
+        from googlesearch import search
+
+        def run():
+            # Convert the generator to a list inside the worker thread; iterating it performs the HTTP requests.
+            return list(search(query, num_results=num_results, unique=True, region=region))
+
+        return await asyncio.get_running_loop().run_in_executor(search_executor, run)
+
+
+class LocalSearchBackend(SearchBackend):
+    """
+    Offline BM25 search over LOCAL_CORPUS_DIR. The index is brought up to date on
+    the first search of a run, re-indexing only changed files. Results are file:// URLs.
+    """
+
+    name = "local"
+    # The index answers in milliseconds and changes with the corpus, so results are not cached.
+    cacheable = False
+
+    def __init__(self, corpus_dir=LOCAL_CORPUS_DIR, index_path=LOCAL_INDEX_PATH, extensions=LOCAL_CORPUS_EXTENSIONS,
+                 max_concurrency=SEARCH_MAX_CONCURRENCY):
+        # Local lookups need no pacing.
+        super().__init__(max_concurrency=max_concurrency, min_interval=0.0)
+        self.index = LocalIndex(corpus_dir, index_path, extensions)
+        self._updated = None
+
+    async def _search(self, query, num_results, region):
+        loop = asyncio.get_running_loop()
+        if self._updated is None:
+            self._updated = loop.run_in_executor(search_executor, self.index.update)
+            counts = await self._updated
+            print(f"Local index updated: {counts['added']} added, {counts['updated']} updated, "
+                  f"{counts['removed']} removed, {counts['unchanged']} unchanged.")
+        else:
+            await self._updated
+        return await loop.run_in_executor(search_executor, self.index.search, query, num_results)
+
+    def close(self):
+        self.index.close()
+
+
+def close_search_backends():
+    search_executor.shutdown(wait=False)
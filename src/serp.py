@@ -1,12 +1,33 @@
 """
 Handles generation of follow-up questions and SERP queries via OpenAI models,
-as well as searching using the googlesearch package.
+as well as searching through the configured search backend.
 """
 
-from src.config import SEARCH_PER_SERP
-from src.ai import get_ai_responses
+import asyncio
+import os
+import re
+from src.config import (
+    SEARCH_PER_SERP, SEARCH_BACKEND, SEARCH_REGION, CACHE_DIR,
+    SERP_CACHE_ENABLED, SERP_CACHE_MAX_BYTES, SERP_CACHE_TTL, SERP_CACHE_SERVE_STALE, SERP_CACHE_MAX_STALE,
+)
+from src.ai import get_ai_responses, AIResponseError
 from src.utils import ModelType 
-from googlesearch import search
+from src.single_flight import SingleFlight
+from src.cache import SQLiteCache, make_key
+from src.search_backends import GoogleSearchBackend, LocalSearchBackend
+
+SEARCH_BACKENDS = {
+    "google": GoogleSearchBackend,
+    "local": LocalSearchBackend,
+}
+search_backend = SEARCH_BACKENDS[SEARCH_BACKEND]()
+
+serp_cache = SQLiteCache(os.path.join(CACHE_DIR, "serp_results.sqlite"), max_bytes=SERP_CACHE_MAX_BYTES, ttl=SERP_CACHE_TTL)
+# Background refreshes of stale cache entries, kept referenced until they finish.
+serp_revalidations = set()
+
+# Concurrent searches for the same query share one result.
+serp_flights = SingleFlight("searches")
 
 async def generate_serp_queries(messages):
     """
@@ -19,14 +40,56 @@ async def generate_serp_queries(messages):
        List[str]: A list of SERP query strings.
     """
     
-    response = await get_ai_responses(messages=messages, model=ModelType.REASONING)
+    try:
+        response = await get_ai_responses(messages=messages, model=ModelType.REASONING, tag="serp")
+    except AIResponseError as e:
+        print(f"Could not generate SERP queries: {e}")
+        return []
     queries = [line.strip() for line in response.split("\n") if line.strip()]
     return queries
     
 
+def normalize_query(query):
+    """
+    Normalize a query for caching: lower case, punctuation removed (search operators
+    such as quotes, leading '-' and 'site:domain' are kept, and so are '+', '#' and '%',
+    which tell apart queries like "C++", "C#" and "C") and whitespace collapsed.
+    """
+    query = re.sub(r'[^\w\s":.+#%-]', " ", query.lower())
+    # Dots are only meaningful inside tokens such as domain names.
+    return " ".join(token.strip(".") for token in query.split() if token.strip("."))
+
+
+async def run_search(query, key):
+    try:
+        urls = await search_backend.search(query, SEARCH_PER_SERP, SEARCH_REGION)
+    except Exception as e:
+        print(f"Search failed for '{query}': {e}")
+        return []
+    # Failed or empty searches are not cached so that they are retried next time.
+    if SERP_CACHE_ENABLED and search_backend.cacheable and urls:
+        serp_cache.set(key, urls)
+    return urls
+
+
+def revalidate(query, key):
+    task = asyncio.create_task(serp_flights.do(key, lambda: run_search(query, key)))
+    serp_revalidations.add(task)
+    task.add_done_callback(serp_revalidations.discard)
+
+
+async def wait_for_revalidations():
+    """
+    Wait for background refreshes of stale search results to finish.
+    """
+    if serp_revalidations:
+        await asyncio.gather(*serp_revalidations, return_exceptions=True)
+
+
 async def search_serp(query):
     """
-    Use the googlesearch package to search for a query.
+    Search for a query with the configured search backend without blocking the event loop.
+    Results are cached by normalized query, region and result count.
     
     Parameters:
        query (str): The search query.
@@ -34,5 +97,14 @@ async def search_serp(query):
     Returns:
        List[str]: A list of URLs (up to SEARCH_PER_SERP results).
     """
-    # Convert the generator to a list.
-    return list(search(query, num_results=SEARCH_PER_SERP, unique=True, region="us"))
\ No newline at end of file
+    key = make_key(search_backend.name, normalize_query(query), SEARCH_REGION, SEARCH_PER_SERP)
+    if SERP_CACHE_ENABLED and search_backend.cacheable:
+        if SERP_CACHE_SERVE_STALE:
+            urls, is_stale = serp_cache.get_stale(key, max_stale=SERP_CACHE_MAX_STALE)
+            if is_stale:
+                revalidate(query, key)
+        else:
+            urls = serp_cache.get(key)
+        if urls is not None:
+            return urls
+    return await serp_flights.do(key, lambda: run_search(query, key))
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""
+Single-flight de-duplication of concurrent identical requests.
+While a call for a key is in flight, later callers with the same key wait for
+that call and share its result instead of starting their own.
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one underlying call.
+
+    Parameters:
+        name (str): Label used when reporting counters.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._in_flight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, call):
+        """
+        Run call() for key, or join the call already in flight for the same key.
+
+        Parameters:
+            key: A hashable key identifying identical requests.
+            call: A zero-argument function returning the coroutine to run.
+
+        Returns:
+            The result of the shared call (exceptions are shared as well).
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            future = asyncio.ensure_future(call())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shield the shared call so that one cancelled caller does not cancel it for the others.
+        return await asyncio.shield(future)
+
+    async def do_many(self, keys, call):
+        """
+        Run one call for the keys that are not in flight and join the calls already
+        in flight for the others. Used for batched requests, where each key is one item.
+
+        Parameters:
+            keys (list): Hashable keys, one per requested item.
+            call: A function taking the list of keys not in flight and returning a coroutine
+                that resolves to their results, in the same order.
+
+        Returns:
+            list: The result for each key, in the order of keys.
+        """
+        futures = {}
+        fresh = []
+        for key in dict.fromkeys(keys):
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                futures[key] = future
+            else:
+                fresh.append(key)
+        if fresh:
+            self.calls += 1
+            batch = asyncio.ensure_future(call(fresh))
+
+            async def item(index):
+                return (await batch)[index]
+
+            for index, key in enumerate(fresh):
+                future = asyncio.ensure_future(item(index))
+                self._in_flight[key] = future
+                future.add_done_callback(lambda _, key=key: self._in_flight.pop(key, None))
+                futures[key] = future
+        # As in do(), a cancelled caller leaves the shared items running for the others.
+        results = dict(zip(futures, await asyncio.gather(*(asyncio.shield(future) for future in futures.values()))))
+        return [results[key] for key in keys]
+
+    def stats(self):
+        """
+        Return the number of underlying calls and of calls (or batch items) that joined one in flight.
+        """
+        return {"calls": self.calls, "coalesced": self.coalesced}
@@ -0,0 +1,72 @@
+"""
+URL canonicalization for My ResearchPal.
+Variants of the same page (http/https, www./bare host, default ports,
+trailing slashes, fragments, tracking parameters, query order) map to one
+canonical form, which is used wherever URLs are deduplicated.
+"""
+
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, urljoin
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PARAMS = {
+    "gclid", "gclsrc", "dclid", "fbclid", "msclkid", "yclid", "igshid", "twclid", "ttclid", "li_fat_id",
+    "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok", "oly_anon_id", "oly_enc_id",
+    "ref_src", "ref_url", "spm", "vero_id", "wickedid",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_")
+
+LINK_TAG = re.compile(r"<link\b[^>]*>", re.IGNORECASE)
+TAG_ATTRIBUTE = re.compile(r"""([\w-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""")
+
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url):
+    """
+    Return the canonical form of a URL: https scheme for web pages, lower-case
+    host without "www." and default port, no trailing slash or fragment, and the
+    query without tracking parameters and sorted by name.
+    Non-web URLs (e.g. file://) only lose their fragment.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return urlunsplit((scheme, parts.netloc, parts.path, parts.query, ""))
+    host = (parts.hostname or "").rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port is not None and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    path = re.sub(r"/{2,}", "/", parts.path) or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) if not is_tracking_param(name)
+    ))
+    return urlunsplit(("https", host, path, query, ""))
+
+
+def find_rel_canonical(html, base_url):
+    """
+    Return the absolute URL declared by <link rel="canonical"> in an HTML page, or None.
+    A canonical pointing at the site root from a deeper page is ignored as a common misconfiguration.
+    """
+    for tag in LINK_TAG.findall(html):
+        attributes = {name.lower(): double or single or bare for name, double, single, bare in TAG_ATTRIBUTE.findall(tag)}
+        if "canonical" not in attributes.get("rel", "").lower().split() or not attributes.get("href"):
+            continue
+        canonical = urljoin(base_url, attributes["href"].strip())
+        if urlsplit(canonical).scheme.lower() not in DEFAULT_PORTS:
+            return None
+        if urlsplit(canonical).path in ("", "/") and urlsplit(base_url).path not in ("", "/"):
+            return None
+        return canonical
+    return None
@@ -0,0 +1,102 @@
+"""
+Token, latency and cost accounting for OpenAI calls.
+Every call is recorded with the call site that issued it (its tag) so that
+usage can be aggregated per tag and per model.
+"""
+
+import math
+from src.config import MODEL_PRICING
+
+
+def percentile(values, q):
+    """
+    Return the q-th percentile (0-100) of values using the nearest-rank method.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def estimate_cost(model, prompt_tokens, cached_tokens, completion_tokens):
+    """
+    Estimate the cost in USD of a call from the per-million-token prices in MODEL_PRICING.
+    """
+    prices = MODEL_PRICING.get(model)
+    if prices is None:
+        return 0.0
+    uncached = prompt_tokens - cached_tokens
+    return (
+        uncached * prices["input"]
+        + cached_tokens * prices.get("cached_input", prices["input"])
+        + completion_tokens * prices.get("output", 0.0)
+    ) / 1_000_000
+
+
+class UsageTracker:
+    """
+    Keeps one record per API call or cache hit and aggregates them per tag and per model.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, model, usage, tag=None, latency=None, cache_hit=False):
+        """
+        Record one call.
+
+        Parameters:
+            model (str): The model name.
+            usage: The usage object returned by the API (None for cache hits).
+            tag (str): The call site, e.g. "crawl-summary" or "section".
+            latency (float): Wall-clock seconds of the call, including queueing and retries.
+            cache_hit (bool): Whether the reply was served from the local response cache.
+        """
+        details = getattr(usage, "prompt_tokens_details", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        self.records.append({
+            "tag": tag or "untagged",
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "completion_tokens": completion_tokens,
+            "latency": latency,
+            "cache_hit": cache_hit,
+            "cost": estimate_cost(model, prompt_tokens, cached_tokens, completion_tokens),
+        })
+
+    def _aggregate(self, field):
+        groups = {}
+        for record in self.records:
+            groups.setdefault(record[field], []).append(record)
+        totals = {}
+        for name, records in groups.items():
+            latencies = [r["latency"] for r in records if r["latency"] is not None and not r["cache_hit"]]
+            totals[name] = {
+                "calls": sum(not r["cache_hit"] for r in records),
+                "cache_hits": sum(r["cache_hit"] for r in records),
+                "prompt_tokens": sum(r["prompt_tokens"] for r in records),
+                "cached_tokens": sum(r["cached_tokens"] for r in records),
+                "completion_tokens": sum(r["completion_tokens"] for r in records),
+                "latency_p50": percentile(latencies, 50),
+                "latency_p90": percentile(latencies, 90),
+                "latency_p99": percentile(latencies, 99),
+                "latency_total": sum(latencies),
+                "estimated_cost": sum(r["cost"] for r in records),
+            }
+        return totals
+
+    def summary(self):
+        """
+        Return totals per model.
+        """
+        return self._aggregate("model")
+
+    def summary_by_tag(self):
+        """
+        Return totals per call site.
+        """
+        return self._aggregate("tag")
@@ -6,6 +6,7 @@ Includes text splitting and prompt saving.
 import os
 import datetime
 from enum import Enum
+from src.urls import canonicalize_url
 
 class ModelType(Enum):
     KNOWLEDGEABLE = "chatgpt-4o-latest"
@@ -19,6 +20,12 @@ url_separator_end = "#####ENDING SEPARATOR#####"
 section_separator_begin = url_separator_begin
 section_separator_end = url_separator_end
 
+def format_source(url: str, summary: str) -> str:
+    """
+    Formats a source summary as a delimited block that models can cite by URL.
+    """
+    return f"{url_separator_begin}\n **Source URL:** \"{url}\"\n{summary.strip()}\n{url_separator_end}\n\n"
+
 def split_into_three_sentences(text: str) -> list:
     """
     Splits the provided text into blocks where each block contains three sentences.
@@ -35,14 +42,48 @@ def split_into_three_sentences(text: str) -> list:
         blocks.append(block)
     return blocks
 
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimates the number of tokens in a text (about four characters per token).
+    """
+    return len(text) // 4 + 1
+
+def chunk_text(text: str, max_tokens: int) -> list:
+    """
+    Splits text into consecutive chunks of at most max_tokens (estimated), breaking
+    at blank lines where possible and inside overlong paragraphs only when necessary.
+    """
+    max_chars = max_tokens * 4
+    chunks = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            cut = paragraph.rfind("\n", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            chunks.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip("\n")
+        if current and len(current) + 2 + len(paragraph) > max_chars:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = current + "\n\n" + paragraph if current else paragraph
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
 def unique_urls(urls: list) -> list:
     """
     Flattens and Removes duplicate URLs from the provided list of list of urls.
+    URLs are compared in canonical form; the first variant seen is kept.
     """
-    unique_ruls = set()
+    unique_ruls = {}
     for url_list in urls:
-        unique_ruls.update(url_list)
-    return list(unique_ruls)
+        for url in url_list:
+            unique_ruls.setdefault(canonicalize_url(url), url)
+    return list(unique_ruls.values())
 
 
 def parse_toc(table_of_contents):
@@ -0,0 +1,92 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import src.cache as cache
+from src.cache import SQLiteCache, make_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = SQLiteCache(str(tmp_path / "cache" / "entries.sqlite"), max_bytes=1000, ttl=60)
+    yield store
+    store.close()
+
+
+def test_make_key_is_stable_and_order_insensitive_for_dicts():
+    assert make_key("model", {"a": 1, "b": 2}) == make_key("model", {"b": 2, "a": 1})
+    assert make_key("model", [1, 2]) != make_key("model", [2, 1])
+
+
+def test_values_round_trip_and_count_hits(store):
+    assert store.get("k") is None
+    store.set("k", {"reply": "hello", "urls": ["https://example.com"]})
+    assert store.get("k") == {"reply": "hello", "urls": ["https://example.com"]}
+    assert (store.hits, store.misses) == (1, 1)
+
+
+def test_entries_expire_after_ttl(store, clock):
+    store.set("k", "value")
+    clock.now += 60
+    assert store.get("k") == "value"
+    clock.now += 1
+    assert store.get("k") is None
+    assert store.expired == 1
+
+
+def test_least_recently_used_entries_are_evicted(store, clock):
+    for key in ("a", "b", "c"):
+        store.set(key, "x" * 300)
+        clock.now += 1
+    store.get("a")
+    clock.now += 1
+    store.set("d", "x" * 300)
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None and store.get("d") is not None
+    assert store.evictions == 1
+
+
+def test_entries_survive_reopening(tmp_path, clock):
+    path = str(tmp_path / "entries.sqlite")
+    first = SQLiteCache(path, max_bytes=1000)
+    first.set("k", [1, 2, 3])
+    first.close()
+    second = SQLiteCache(path, max_bytes=1000)
+    assert second.get("k") == [1, 2, 3]
+    second.close()
+
+
+def test_expired_entries_are_served_stale_within_max_stale(store, clock):
+    store.set("k", ["https://example.com"])
+    assert store.get_stale("k", max_stale=100) == (["https://example.com"], False)
+    clock.now += 120
+    assert store.get_stale("k", max_stale=100) == (["https://example.com"], True)
+    clock.now += 100
+    assert store.get_stale("k", max_stale=100) == (None, False)
+    assert (store.hits, store.stale_hits, store.expired) == (1, 1, 1)
+
+
+def test_refreshing_a_stale_entry_makes_it_fresh(store, clock):
+    store.set("k", "old")
+    clock.now += 120
+    assert store.get_stale("k") == ("old", True)
+    store.set("k", "new")
+    assert store.get_stale("k") == ("new", False)
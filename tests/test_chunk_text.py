@@ -0,0 +1,74 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils import chunk_text, estimate_tokens
+
+
+def words(text):
+    return text.split()
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("First paragraph.\n\nSecond paragraph.", 100) == ["First paragraph.\n\nSecond paragraph."]
+
+
+def test_empty_text_has_no_chunks():
+    assert chunk_text("", 100) == []
+    assert chunk_text("\n\n\n\n", 100) == []
+
+
+def test_chunks_break_at_paragraphs_and_keep_all_text():
+    paragraphs = [f"Paragraph {i} " + "word " * 30 for i in range(20)]
+    text = "\n\n".join(paragraphs)
+    chunks = chunk_text(text, 100)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 400 for chunk in chunks)
+    assert words(" ".join(chunks)) == words(text)
+    # No paragraph is split when every paragraph fits.
+    assert all(chunk.startswith("Paragraph") for chunk in chunks)
+
+
+def test_overlong_paragraph_is_split_at_line_breaks():
+    lines = [f"line {i} " + "x" * 50 for i in range(40)]
+    paragraph = "\n".join(lines)
+    chunks = chunk_text("Intro.\n\n" + paragraph, 100)
+    assert chunks[0] == "Intro."
+    assert all(len(chunk) <= 400 for chunk in chunks)
+    assert all(chunk.startswith(("line", "Intro")) for chunk in chunks)
+    assert words(" ".join(chunks)) == words("Intro.\n\n" + paragraph)
+
+
+def test_text_without_line_breaks_is_cut_at_the_limit():
+    chunks = chunk_text("x" * 1000, 100)
+    assert [len(chunk) for chunk in chunks] == [400, 400, 200]
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("x" * 400) == 101
+
+
+def test_summary_reduction_stops_after_reduce_levels(monkeypatch):
+    import asyncio
+    import src.crawler as crawler
+    calls = []
+
+    async def echo(messages, model, tag=None):
+        # A model that keeps every sentence, so the chunk summaries never get shorter.
+        calls.append((tag, messages[-1]["content"]))
+        return messages[-1]["content"]
+
+    monkeypatch.setattr(crawler, "get_ai_responses", echo)
+    monkeypatch.setattr(crawler, "SUMMARY_CHUNK_TOKENS", 100)
+    monkeypatch.setattr(crawler, "SUMMARY_PAGE_TOKEN_BUDGET", 1000)
+    monkeypatch.setattr(crawler, "SUMMARY_REDUCE_LEVELS", 1)
+    page = "\n\n".join(f"Paragraph {i} " + "word " * 30 for i in range(40))
+    asyncio.run(crawler.summarize_page(page))
+    final = [content for tag, content in calls if tag == "crawl-summary"]
+    assert len(final) == 1
+    assert estimate_tokens(final[0]) <= 101
+    # One map over the page and one over the combined chunk summaries.
+    chunk_calls = [content for tag, content in calls if tag == "crawl-summary-chunk"]
+    assert sum(content.startswith("Part 1 of") for content in chunk_calls) == 2
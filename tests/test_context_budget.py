@@ -0,0 +1,111 @@
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import src.context_budget as context_budget
+from src.context_budget import ContextBudget, compress_summary, format_sources
+from src.utils import estimate_tokens
+
+
+@pytest.fixture
+def keyword_embeddings(monkeypatch):
+    # Texts mentioning "apple" point one way, texts mentioning "pear" the other.
+    async def embed(texts, tag=None):
+        return np.array([[text.count("apple") + 0.01, text.count("pear") + 0.01] for text in texts], dtype=np.float32)
+
+    monkeypatch.setattr(context_budget, "get_embeddings", embed)
+
+
+def make_sources(count, words=200):
+    return [
+        {"url": f"https://example.com/{i}", "summary": f"Finding {i}. " + ("apple " if i % 2 else "pear ") * words + "The end."}
+        for i in range(count)
+    ]
+
+
+def urls(text):
+    return [line.split('"')[1] for line in text.splitlines() if "**Source URL:**" in line]
+
+
+def test_everything_is_sent_unchanged_when_it_fits(keyword_embeddings):
+    budget = ContextBudget({"toc": 100000}, compressed_tokens=50)
+    sources = make_sources(4)
+    assert asyncio.run(budget.fit("toc", sources, "apple")) == format_sources(sources)
+    assert budget.stats()["sites"]["toc"]["full"] == 4
+
+
+def test_relevant_sources_are_kept_within_the_budget(keyword_embeddings):
+    budget = ContextBudget({"serp": 700}, compressed_tokens=50)
+    text = asyncio.run(budget.fit("serp", make_sources(6), "apple"))
+    assert estimate_tokens(text) <= 700
+    kept = urls(text)
+    # The apple sources come first; the rest only fit shortened or not at all.
+    assert kept[:3] == ["https://example.com/1", "https://example.com/3", "https://example.com/5"]
+    counts = budget.stats()["sites"]["serp"]
+    assert counts["full"] + counts["compressed"] + counts["dropped"] == 6
+    assert counts["compressed"] > 0
+
+
+def test_select_returns_plain_sources(keyword_embeddings):
+    budget = ContextBudget({"serp": 100000}, compressed_tokens=50)
+    sources = [{"url": "https://example.com/a", "summary": "Text.", "alternates": ["https://mirror/a"]},
+               {"url": "https://example.com/b", "summary": ""}]
+    assert asyncio.run(budget.select("serp", sources, "q")) == [{"url": "https://example.com/a", "summary": "Text."}]
+
+
+def test_compress_summary_keeps_leading_sentences():
+    summary = "First finding. Second finding is longer. " + "Detail " * 100
+    assert compress_summary(summary, 12) == "First finding. Second finding is longer. ..."
+    assert compress_summary("Short.", 10) == "Short."
+
+
+class FakeStream:
+    def __init__(self, urls):
+        self.results = [{"url": url, "success": True, "summary": "finding " * 150} for url in urls]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.results:
+            raise StopAsyncIteration
+        return self.results.pop(0)
+
+    def pending(self):
+        return []
+
+    def pending_urls(self):
+        return []
+
+
+def test_follow_up_planning_stays_within_the_serp_budget(keyword_embeddings, monkeypatch):
+    import src.research as research
+
+    prompt_sizes = []
+
+    async def plan(messages):
+        prompt_sizes.append(sum(estimate_tokens(m["content"]) for m in messages if m["content"].startswith("Additional context")))
+        return [f"follow-up {len(prompt_sizes)}"]
+
+    async def search(query):
+        return [f"https://example.com/{query}/{i}" for i in range(3)]
+
+    monkeypatch.setattr(research, "generate_serp_queries", plan)
+    monkeypatch.setattr(research, "search_serp", search)
+    monkeypatch.setattr(research, "crawl_urls", lambda urls, as_completed=False, topic=None: FakeStream(urls))
+    monkeypatch.setitem(research.research_context.budgets, "serp", 500)
+
+    async def run():
+        engine = research.ResearchEngine([{"role": "user", "content": "question"}], max_depth=4, novelty=False)
+        engine._changed = asyncio.Condition()
+        engine.push("root", None, 1)
+        await engine.worker()
+
+    asyncio.run(run())
+    assert len(prompt_sizes) == 3
+    assert all(size <= 500 for size in prompt_sizes)
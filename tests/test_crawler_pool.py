@@ -0,0 +1,72 @@
+"""
+Browser crashes reported by Crawl4AI as failed results must still retire the pooled browser.
+AsyncWebCrawler is replaced by a fake whose browser can be made to die.
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import src.crawler as crawler
+import src.crawler_pool as crawler_pool
+from src.crawler_pool import CrawlerPool, is_browser_crash
+
+CRASH_MESSAGE = (
+    "Unexpected error in _crawl_web at line 700 in _crawl_web (async_crawler_strategy.py):\n"
+    "Error: Page.goto: Target page, context or browser has been closed\n\n"
+    "Code context:\n  700 → response = await page.goto(url)"
+)
+
+
+class FakeCrawler:
+    instances = []
+
+    def __init__(self):
+        self.dead = False
+        self.closed = False
+        FakeCrawler.instances.append(self)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+    async def arun(self, url, config=None):
+        if self.dead:
+            return SimpleNamespace(success=False, error_message=CRASH_MESSAGE)
+        return SimpleNamespace(success=True, markdown=f"Content of {url}", response_headers={}, html="", url=url)
+
+
+def test_is_browser_crash():
+    assert is_browser_crash(CRASH_MESSAGE)
+    assert is_browser_crash("Error: Browser has disconnected")
+    assert not is_browser_crash("Unexpected error:\nError: net::ERR_NAME_NOT_RESOLVED at https://example.com\n\n"
+                                "Code context:\n  12 → # the browser context is closed later")
+    assert not is_browser_crash(None)
+
+
+def test_render_page_retires_crashed_browser(monkeypatch):
+    FakeCrawler.instances = []
+    pool = CrawlerPool(1, 1, 50)
+    monkeypatch.setattr(crawler_pool, "AsyncWebCrawler", FakeCrawler)
+    monkeypatch.setattr(crawler, "crawler_pool", pool)
+    monkeypatch.setattr(crawler, "crawl_scheduler", SimpleNamespace(submit=lambda url, call: call()))
+
+    async def run():
+        first = await crawler.render_page("https://example.com/a")
+        FakeCrawler.instances[0].dead = True
+        crashed = await crawler.render_page("https://example.com/b")
+        after = await crawler.render_page("https://example.com/c")
+        return first, crashed, after
+
+    first, crashed, after = asyncio.run(run())
+    assert first["markdown"] == "Content of https://example.com/a"
+    assert crashed is None
+    assert after["markdown"] == "Content of https://example.com/c"
+    assert len(FakeCrawler.instances) == 2
+    assert FakeCrawler.instances[0].closed
+    assert pool.crashes == 1 and pool.recycles == 1
@@ -0,0 +1,97 @@
+"""
+Embedding failures must degrade the optional steps that use embeddings, never lose results.
+The OpenAI client is replaced by one whose embedding requests fail with a connection error.
+"""
+
+import asyncio
+import os
+import sys
+
+import httpx
+import openai
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import src.ai as ai
+import src.research as research
+from src.ai import AIResponseError, get_embeddings
+from src.relevance_gate import RelevanceGate
+from src.context_budget import ContextBudget
+
+
+class FailingEmbeddings:
+    async def create(self, **kwargs):
+        raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+
+
+class FailingClient:
+    embeddings = FailingEmbeddings()
+
+
+@pytest.fixture
+def failing_embeddings(monkeypatch):
+    monkeypatch.setattr(ai.client_manager, "_client", FailingClient())
+    monkeypatch.setattr(ai.scheduler, "max_retries", 0)
+    monkeypatch.setattr(ai, "EMBEDDING_STORE_ENABLED", False)
+
+
+class FakeStream:
+    def __init__(self, urls):
+        self.results = [{"url": url, "success": True, "summary": f"Summary of {url}."} for url in urls]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.results:
+            raise StopAsyncIteration
+        return self.results.pop(0)
+
+    def pending(self):
+        return []
+
+    def pending_urls(self):
+        return []
+
+
+def test_get_embeddings_wraps_api_errors(failing_embeddings):
+    with pytest.raises(AIResponseError):
+        asyncio.run(get_embeddings(["some text"], tag="test"))
+
+
+def test_novelty_failure_keeps_summaries(failing_embeddings, monkeypatch):
+    async def search(query):
+        return ["https://example.com/a", "https://example.com/b"]
+
+    async def plan(messages):
+        return []
+
+    monkeypatch.setattr(research, "search_serp", search)
+    monkeypatch.setattr(research, "generate_serp_queries", plan)
+    monkeypatch.setattr(research, "crawl_urls", lambda urls, as_completed=False, topic=None: FakeStream(urls))
+
+    async def run():
+        engine = research.ResearchEngine([{"role": "user", "content": "question"}], max_depth=2)
+        engine.push("query one", None, 1)
+        engine._changed = asyncio.Condition()
+        await engine.worker()
+        return engine
+
+    engine = asyncio.run(run())
+    assert [source["url"] for source in engine.urls_summaries] == ["https://example.com/a", "https://example.com/b"]
+    assert engine.novelty_scores == []
+
+
+def test_relevance_gate_keeps_page_when_embedding_fails(failing_embeddings):
+    gate = RelevanceGate(threshold=0.2, min_words=5, sample_tokens=100)
+    page = "A long enough page about the research topic with plenty of words in it. " * 10
+    assert asyncio.run(gate.check("research topic", page)) == (None, None)
+
+
+def test_context_budget_keeps_source_order_when_embedding_fails(failing_embeddings):
+    budget = ContextBudget({"serp": 200}, compressed_tokens=20)
+    sources = [{"url": f"https://example.com/{i}", "summary": f"Finding {i}. " + "detail " * 100} for i in range(3)]
+    selected = asyncio.run(budget.select("serp", sources, "query"))
+    assert [source["url"] for source in selected] == [f"https://example.com/{i}" for i in range(len(selected))]
+    assert selected
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.embedding_store import EmbeddingStore, KEY_SIZE
+
+
+def vectors(*rows):
+    return np.array([[row, row + 0.5, -row] for row in rows], dtype=np.float32)
+
+
+def test_add_and_lookup(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "store"), "test-model")
+    rows, found = store.lookup(["a"])
+    assert rows == [-1] and found.shape[0] == 0
+    store.add(["a", "b"], vectors(1, 2))
+    rows, found = store.lookup(["b", "missing", "a"])
+    assert rows == [1, -1, 0]
+    np.testing.assert_array_equal(found, vectors(2, 1))
+    assert found.dtype == np.float32
+    assert (store.hits, store.misses) == (2, 2)
+
+
+def test_stored_texts_are_not_appended_again(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "store"), "test-model")
+    store.add(["a"], vectors(1))
+    store.add(["a", "c"], vectors(9, 3))
+    assert store.count == 2
+    np.testing.assert_array_equal(store.lookup(["a"])[1], vectors(1))
+
+
+def test_store_is_reopened_from_disk(tmp_path):
+    directory = str(tmp_path / "store")
+    EmbeddingStore(directory, "test-model").add(["a", "b"], vectors(1, 2))
+    reopened = EmbeddingStore(directory, "test-model")
+    rows, found = reopened.lookup(["a", "b"])
+    assert rows == [0, 1]
+    np.testing.assert_array_equal(found, vectors(1, 2))
+
+
+def test_interrupted_append_is_truncated_on_load(tmp_path):
+    directory = str(tmp_path / "store")
+    EmbeddingStore(directory, "test-model").add(["a", "b"], vectors(1, 2))
+    # A crash after writing a vector row and half of its key.
+    with open(os.path.join(directory, "vectors.f32"), "ab") as f:
+        f.write(vectors(3).tobytes())
+    with open(os.path.join(directory, "keys.bin"), "ab") as f:
+        f.write(b"\x00" * (KEY_SIZE // 2))
+    reopened = EmbeddingStore(directory, "test-model")
+    assert reopened.lookup(["a", "b"])[0] == [0, 1]
+    assert reopened.count == 2
+    assert os.path.getsize(os.path.join(directory, "keys.bin")) == 2 * KEY_SIZE
+    assert os.path.getsize(os.path.join(directory, "vectors.f32")) == 2 * 3 * 4
+    reopened.add(["c"], vectors(3))
+    np.testing.assert_array_equal(EmbeddingStore(directory, "test-model").lookup(["c"])[1], vectors(3))
+
+
+def test_compact_keeps_used_rows_then_recent_ones(tmp_path):
+    directory = str(tmp_path / "store")
+    EmbeddingStore(directory, "test-model").add(["a", "b", "c", "d"], vectors(1, 2, 3, 4))
+    store = EmbeddingStore(directory, "test-model")
+    store.lookup(["a"])
+    assert store.compact(2) == 2
+    assert store.lookup(["a", "b", "c", "d"])[0] == [0, -1, -1, 1]
+    reopened = EmbeddingStore(directory, "test-model")
+    rows, found = reopened.lookup(["a", "d"])
+    assert rows == [0, 1]
+    np.testing.assert_array_equal(found, vectors(1, 4))
@@ -0,0 +1,48 @@
+import asyncio
+import os
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import src.fast_fetch as fast_fetch
+from src.fast_fetch import fetch_fast, html_to_markdown
+
+BODY = "<p>" + "A sentence with several words about the research topic. " * 40 + "</p>"
+HTML = f"<html><head><title>Page</title></head><body>{BODY}</body></html>"
+XHTML = f'<?xml version="1.0" encoding="utf-8"?>\n<html xmlns="http://www.w3.org/1999/xhtml"><body>{BODY}</body></html>'
+
+
+def fetch(html, min_words=50):
+    def handler(request):
+        return httpx.Response(200, headers={"content-type": "text/html; charset=utf-8"}, content=html.encode("utf-8"))
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await fetch_fast(client, "https://example.com/page", min_words, 1024 * 1024)
+
+    return asyncio.run(run())
+
+
+def test_static_html_is_served_without_browser():
+    page, reason = fetch(HTML)
+    assert reason is None
+    assert "research topic" in page["markdown"]
+
+
+def test_unparsed_html_is_left_to_browser():
+    assert html_to_markdown("https://example.com/page", XHTML) is None
+    assert fetch(XHTML, min_words=1) == (None, "unparsed")
+
+
+def test_conversion_errors_are_left_to_browser(monkeypatch):
+    def broken(url, html):
+        raise ValueError("parser failure")
+
+    monkeypatch.setattr(fast_fetch, "html_to_markdown", broken)
+    assert fetch(HTML) == (None, "unparsed")
+
+
+def test_thin_pages_are_left_to_browser():
+    assert fetch("<html><body><p>Too short.</p></body></html>") == (None, "thin")
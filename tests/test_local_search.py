@@ -0,0 +1,74 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.local_search import LocalIndex, tokenize, encode_postings, decode_postings
+
+
+def write(path, text, mtime):
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    corpus_dir = tmp_path / "corpus"
+    corpus_dir.mkdir()
+    write(corpus_dir / "bees.md", "Honey bees pollinate crops. Bees live in hives.", 1000)
+    write(corpus_dir / "rust.txt", "Rust ownership and borrowing prevent data races.", 1000)
+    write(corpus_dir / "notes.html", "<html><body><p>Bees and wasps differ in diet, nesting habits, stinging behaviour and social structure.</p><script>ignored()</script></body></html>", 1000)
+    write(corpus_dir / "skip.csv", "bees,bees,bees", 1000)
+    index = LocalIndex(str(corpus_dir), str(tmp_path / "index.sqlite"), (".md", ".txt", ".html"))
+    yield corpus_dir, index
+    index.close()
+
+
+def names(urls):
+    return [Path(url[len("file://"):]).name for url in urls]
+
+
+def test_tokenize_drops_stopwords_and_single_characters():
+    assert tokenize("The bees of a Hive: X") == ["bees", "hive"]
+
+
+def test_postings_round_trip():
+    postings = [(1, 3), (5, 1), (300, 2), (100000, 7)]
+    assert decode_postings(encode_postings(postings)) == postings
+
+
+def test_search_ranks_by_bm25(corpus):
+    _, index = corpus
+    assert index.update() == {"added": 3, "updated": 0, "removed": 0, "unchanged": 0}
+    assert names(index.search("bees", 10)) == ["bees.md", "notes.html"]
+    assert names(index.search("borrowing", 10)) == ["rust.txt"]
+    assert index.search("unknownterm", 10) == []
+    assert index.search("ignored", 10) == []
+
+
+def test_update_reindexes_only_changed_files(corpus):
+    corpus_dir, index = corpus
+    index.update()
+    write(corpus_dir / "rust.txt", "Rust has bees now, and bees again.", 2000)
+    (corpus_dir / "notes.html").unlink()
+    write(corpus_dir / "new.md", "Solitary bees nest in the ground.", 1000)
+    assert index.update() == {"added": 1, "updated": 1, "removed": 1, "unchanged": 1}
+    assert set(names(index.search("bees", 10))) == {"bees.md", "rust.txt", "new.md"}
+    assert index.search("borrowing", 10) == []
+    assert names(index.search("wasps", 10)) == []
+    assert index.update() == {"added": 0, "updated": 0, "removed": 0, "unchanged": 3}
+
+
+def test_index_persists_between_instances(corpus, tmp_path):
+    corpus_dir, index = corpus
+    index.update()
+    index.close()
+    reopened = LocalIndex(str(corpus_dir), str(tmp_path / "index.sqlite"), (".md", ".txt", ".html"))
+    try:
+        assert reopened.update()["unchanged"] == 3
+        assert names(reopened.search("borrowing", 10)) == ["rust.txt"]
+    finally:
+        reopened.close()
@@ -0,0 +1,68 @@
+import os
+import random
+import sys
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.near_duplicates import NearDuplicateIndex, simhash, hamming_distance
+from src.local_search import tokenize
+
+ARTICLE = " ".join(
+    f"Paragraph {i} explains how central banks adjust interest rates to steer inflation, employment and credit growth."
+    for i in range(30)
+)
+
+
+def resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def flip(fingerprint, bits):
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def test_small_edits_keep_fingerprints_close():
+    original = simhash(tokenize(ARTICLE))
+    mirrored = simhash(tokenize("Mirrored from example.org. " + ARTICLE + " Share this article."))
+    unrelated = simhash(tokenize(" ".join(f"Recipe step {i}: whisk eggs, fold flour, bake until golden." for i in range(30))))
+    assert hamming_distance(original, mirrored) <= 3
+    assert hamming_distance(original, unrelated) > 10
+
+
+def test_banding_finds_every_fingerprint_within_max_distance():
+    rng = random.Random(7)
+    for _ in range(200):
+        fingerprint = rng.getrandbits(64)
+        index = NearDuplicateIndex(max_distance=3, min_tokens=1)
+        index.add("https://example.com/a", fingerprint, resolved("summary"))
+        near = flip(fingerprint, rng.sample(range(64), rng.randint(0, 3)))
+        assert index.match(near)[0] == "https://example.com/a"
+        far = flip(fingerprint, rng.sample(range(64), 8))
+        assert index.match(far) is None
+
+
+def test_short_pages_are_not_fingerprinted():
+    index = NearDuplicateIndex(max_distance=3, min_tokens=50)
+    assert index.fingerprint("too short to compare") is None
+    assert index.fingerprint(ARTICLE) is not None
+
+
+def test_failed_representatives_are_skipped():
+    index = NearDuplicateIndex(max_distance=3, min_tokens=1)
+    index.add("https://example.com/failed", 12345, resolved(None))
+    assert index.match(12345) is None
+    index.add("https://example.com/ok", 12345, resolved("summary"))
+    assert index.match(12345)[0] == "https://example.com/ok"
+
+
+def test_alternates_are_recorded_once():
+    index = NearDuplicateIndex(max_distance=3, min_tokens=1)
+    index.attach("https://example.com/a", "https://mirror.example.org/a", saved_call=True)
+    index.attach("https://example.com/a", "https://mirror.example.org/a", saved_call=False)
+    assert index.alternates("https://example.com/a") == ["https://mirror.example.org/a"]
+    assert index.stats()["llm_calls_saved"] == 1
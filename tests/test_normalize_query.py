@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.serp import normalize_query
+
+
+def test_case_punctuation_and_whitespace_are_normalized():
+    assert normalize_query("  What is  GDP?? ") == normalize_query("what is gdp")
+
+
+def test_search_operators_are_kept():
+    assert normalize_query('site:bls.gov "Labor Force" -news') == 'site:bls.gov "labor force" -news'
+
+
+def test_trailing_dots_are_dropped():
+    assert normalize_query("inflation in the U.S.") == "inflation in the u.s"
+
+
+def test_language_names_stay_distinct():
+    keys = {normalize_query(query) for query in ("C++ memory model", "C# memory model", "C memory model")}
+    assert len(keys) == 3
+    assert normalize_query("F# vs OCaml") == "f# vs ocaml"
+
+
+def test_percent_is_kept():
+    assert normalize_query("5% inflation") != normalize_query("5 inflation")
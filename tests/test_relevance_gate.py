@@ -0,0 +1,52 @@
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import src.relevance_gate as relevance_gate
+from src.ai import AIResponseError
+from src.relevance_gate import RelevanceGate
+
+PAGES = [f"Page {i} is a long enough page about the research topic with plenty of words in it. " * 10 for i in range(10)]
+
+
+def test_concurrent_checks_request_topic_once(monkeypatch):
+    requests = []
+
+    async def embeddings(texts, tag=None):
+        requests.append(list(texts))
+        await asyncio.sleep(0.01)
+        return np.ones((len(texts), 2), dtype=np.float32)
+
+    monkeypatch.setattr(relevance_gate, "get_embeddings", embeddings)
+    gate = RelevanceGate(threshold=0.2, min_words=5, sample_tokens=100)
+
+    async def run():
+        return await asyncio.gather(*(gate.check("research topic", page) for page in PAGES))
+
+    assert all(reason is None for reason, _ in asyncio.run(run()))
+    assert requests.count(["research topic"]) == 1
+
+
+def test_failed_topic_request_is_retried(monkeypatch):
+    requests = []
+
+    async def embeddings(texts, tag=None):
+        requests.append(list(texts))
+        if len(requests) == 1:
+            raise AIResponseError("unavailable")
+        return np.ones((len(texts), 2), dtype=np.float32)
+
+    monkeypatch.setattr(relevance_gate, "get_embeddings", embeddings)
+    gate = RelevanceGate(threshold=0.2, min_words=5, sample_tokens=100)
+
+    async def run():
+        return [await gate.check("research topic", page) for page in PAGES[:2]]
+
+    first, second = asyncio.run(run())
+    assert first == (None, None)
+    assert second[0] is None and abs(second[1] - 1.0) < 1e-6
+    assert requests.count(["research topic"]) == 2
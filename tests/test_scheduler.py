@@ -0,0 +1,167 @@
+import asyncio
+import os
+import sys
+
+import httpx
+import openai
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import src.scheduler as scheduler_module
+from src.scheduler import TokenBucket, AdaptiveConcurrency, Scheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler_module.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(scheduler_module.asyncio, "sleep", clock.sleep)
+    return clock
+
+
+def rate_limit_error(code=None):
+    response = httpx.Response(429, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    return openai.RateLimitError("rate limited", response=response, body={"code": code} if code else None)
+
+
+def test_token_bucket_refills_over_time(clock):
+    bucket = TokenBucket(60)
+    asyncio.run(bucket.acquire(60))
+    assert bucket.tokens == 0
+    clock.now += 10
+    bucket._refill()
+    assert bucket.tokens == pytest.approx(10)
+
+
+def test_token_bucket_waits_for_tokens(clock):
+    bucket = TokenBucket(60)
+    asyncio.run(bucket.acquire(60))
+    started = clock.now
+    asyncio.run(bucket.acquire(30))
+    assert clock.now - started == pytest.approx(30)
+
+
+def test_oversized_requests_pass_once_the_bucket_is_full(clock):
+    bucket = TokenBucket(60)
+    asyncio.run(bucket.acquire(1000))
+    assert bucket.tokens == 0
+
+
+def test_token_bucket_consume_corrects_estimates(clock):
+    bucket = TokenBucket(100)
+    asyncio.run(bucket.acquire(50))
+    bucket.consume(20)
+    assert bucket.tokens == pytest.approx(30)
+    bucket.consume(-500)
+    assert bucket.tokens == pytest.approx(100)
+
+
+def test_concurrency_grows_additively_and_halves_on_rate_limits():
+    concurrency = AdaptiveConcurrency(initial=4, minimum=1, maximum=6)
+
+    async def cycle(**kwargs):
+        await concurrency.acquire()
+        await concurrency.release(**kwargs)
+
+    asyncio.run(cycle(latency=1.0))
+    assert concurrency.limit == pytest.approx(4.25)
+    asyncio.run(cycle(rate_limited=True))
+    assert concurrency.limit == pytest.approx(2.125)
+    for _ in range(3):
+        asyncio.run(cycle(rate_limited=True))
+    assert concurrency.limit == 1
+    for _ in range(100):
+        asyncio.run(cycle(latency=1.0))
+    assert concurrency.limit == 6
+
+
+def test_concurrency_shrinks_on_latency_spikes():
+    concurrency = AdaptiveConcurrency(initial=10, minimum=1, maximum=20)
+
+    async def cycle(latency):
+        await concurrency.acquire()
+        await concurrency.release(latency=latency)
+
+    asyncio.run(cycle(1.0))
+    limit = concurrency.limit
+    asyncio.run(cycle(10.0))
+    assert concurrency.limit == pytest.approx(limit * 0.9)
+
+
+def test_concurrency_limit_bounds_in_flight_calls():
+    concurrency = AdaptiveConcurrency(initial=2, minimum=1, maximum=2)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        await concurrency.acquire()
+        peak = max(peak, concurrency.in_flight)
+        await asyncio.sleep(0.01)
+        await concurrency.release()
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2 and concurrency.in_flight == 0
+
+
+def make_scheduler(max_retries=3):
+    return Scheduler({"model": {"rpm": 6000, "tpm": 1000000}}, {"rpm": 60, "tpm": 1000}, 4, 1, 8, max_retries, 0.0, 0.0)
+
+
+def test_scheduler_retries_rate_limits(clock):
+    scheduler = make_scheduler()
+    attempts = 0
+
+    async def call():
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise rate_limit_error()
+        return "ok"
+
+    assert asyncio.run(scheduler.run("model", 10, call)) == "ok"
+    stats = scheduler.stats()["model"]
+    assert (stats["attempts"], stats["retries"], stats["rate_limited"], stats["failures"]) == (3, 2, 2, 0)
+
+
+def test_scheduler_gives_up_after_max_retries_and_on_exhausted_quota(clock):
+    scheduler = make_scheduler(max_retries=2)
+
+    async def limited():
+        raise rate_limit_error()
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(scheduler.run("model", 10, limited))
+    assert scheduler.stats()["model"]["attempts"] == 3
+
+    async def no_quota():
+        raise rate_limit_error("insufficient_quota")
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(scheduler.run("model", 10, no_quota))
+    assert scheduler.stats()["model"]["attempts"] == 4
+
+
+def test_scheduler_does_not_retry_other_errors(clock):
+    scheduler = make_scheduler()
+
+    async def broken():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.run("model", 10, broken))
+    assert scheduler.stats()["model"]["attempts"] == 1
@@ -0,0 +1,114 @@
+"""
+Concurrent identical requests share one underlying call.
+Embedding requests are checked against a fake OpenAI client that records every input it embeds.
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import src.ai as ai
+from src.scheduler import Scheduler
+from src.single_flight import SingleFlight
+
+
+class RecordingEmbeddings:
+    def __init__(self):
+        self.requests = []
+
+    async def create(self, input, model):
+        self.requests.append(list(input))
+        await asyncio.sleep(0.01)
+        data = [SimpleNamespace(index=i, embedding=[float(len(text)), 1.0]) for i, text in enumerate(input)]
+        return SimpleNamespace(data=data, usage=SimpleNamespace(prompt_tokens=len(input), total_tokens=len(input)))
+
+
+@pytest.fixture
+def embeddings(monkeypatch, tmp_path):
+    recording = RecordingEmbeddings()
+    monkeypatch.setattr(ai.client_manager, "_client", SimpleNamespace(embeddings=recording))
+    monkeypatch.setattr(ai, "embedding_flights", SingleFlight("embeddings"))
+    # The scheduler's locks belong to the event loop of the test that first used them.
+    monkeypatch.setattr(ai, "scheduler", Scheduler({}, {"rpm": 60000, "tpm": 10000000}, 8, 1, 16, 0, 0.0, 0.0))
+    monkeypatch.setattr(ai, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(ai, "embedding_stores", {})
+    return recording
+
+
+def test_do_shares_one_call():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(*(flights.do("key", call) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["result"] * 5
+    assert calls == [1]
+    assert flights.stats() == {"calls": 1, "coalesced": 4}
+
+
+def test_do_many_joins_items_in_flight():
+    flights = SingleFlight("test")
+    batches = []
+
+    async def call(keys):
+        batches.append(keys)
+        await asyncio.sleep(0.01)
+        return [key.upper() for key in keys]
+
+    async def run():
+        return await asyncio.gather(flights.do_many(["a", "b"], call), flights.do_many(["b", "c", "a"], call))
+
+    assert asyncio.run(run()) == [["A", "B"], ["B", "C", "A"]]
+    assert batches == [["a", "b"], ["c"]]
+    assert flights.stats() == {"calls": 2, "coalesced": 2}
+
+
+def test_do_many_shares_errors():
+    flights = SingleFlight("test")
+
+    async def call(keys):
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def run():
+        return await asyncio.gather(flights.do_many(["a"], call), flights.do_many(["a"], call), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.stats() == {"calls": 1, "coalesced": 1}
+
+
+@pytest.mark.parametrize("store_enabled", [True, False])
+def test_concurrent_embeddings_are_requested_once(embeddings, monkeypatch, store_enabled):
+    monkeypatch.setattr(ai, "EMBEDDING_STORE_ENABLED", store_enabled)
+
+    async def run():
+        return await asyncio.gather(*(ai.get_embeddings(["topic", f"page {i}"]) for i in range(10)))
+
+    results = asyncio.run(run())
+    requested = [text for request in embeddings.requests for text in request]
+    assert requested.count("topic") == 1
+    assert sorted(requested) == sorted(["topic"] + [f"page {i}" for i in range(10)])
+    for i, result in enumerate(results):
+        np.testing.assert_array_equal(result, [[5.0, 1.0], [float(len(f"page {i}")), 1.0]])
+    assert ai.embedding_flights.stats()["coalesced"] == 9
+
+
+def test_repeated_texts_in_one_request_are_not_counted_as_coalesced(embeddings, monkeypatch):
+    monkeypatch.setattr(ai, "EMBEDDING_STORE_ENABLED", False)
+    result = asyncio.run(ai.get_embeddings(["same", "same", "other"]))
+    assert embeddings.requests == [["same", "other"]]
+    np.testing.assert_array_equal(result[0], result[1])
+    assert ai.embedding_flights.stats() == {"calls": 1, "coalesced": 0}
@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.urls import canonicalize_url, find_rel_canonical
+from src.utils import unique_urls
+
+
+def test_variants_of_a_page_share_one_canonical_form():
+    variants = [
+        "https://www.example.com/page",
+        "http://example.com/page/",
+        "https://EXAMPLE.com:443/page#section",
+        "https://example.com//page?utm_source=news&fbclid=abc",
+    ]
+    assert {canonicalize_url(url) for url in variants} == {"https://example.com/page"}
+
+
+def test_query_is_sorted_and_kept():
+    assert canonicalize_url("https://example.com/search?q=x&a=1") == "https://example.com/search?a=1&q=x"
+    assert canonicalize_url("https://example.com/search?q=x") != canonicalize_url("https://example.com/search?q=y")
+
+
+def test_non_default_port_and_root_path():
+    assert canonicalize_url("http://example.com:8080") == "https://example.com:8080/"
+
+
+def test_non_web_urls_only_lose_their_fragment():
+    assert canonicalize_url("file:///tmp/Notes.md#top") == "file:///tmp/Notes.md"
+
+
+def test_rel_canonical_is_resolved_against_the_page():
+    html = '<html><head><link rel="canonical" href="/articles/1"></head></html>'
+    assert find_rel_canonical(html, "https://example.com/articles/1?ref=x") == "https://example.com/articles/1"
+
+
+def test_rel_canonical_with_other_attributes_and_quotes():
+    html = "<link href='https://example.com/a' data-x=1 REL='canonical'>"
+    assert find_rel_canonical(html, "https://mirror.example.org/a") == "https://example.com/a"
+
+
+def test_rel_canonical_to_site_root_is_ignored_for_deeper_pages():
+    html = '<link rel="canonical" href="https://example.com/">'
+    assert find_rel_canonical(html, "https://example.com/articles/1") is None
+    assert find_rel_canonical(html, "https://example.com/") == "https://example.com/"
+
+
+def test_missing_or_non_web_rel_canonical():
+    assert find_rel_canonical('<link rel="stylesheet" href="/a.css">', "https://example.com/") is None
+    assert find_rel_canonical('<link rel="canonical" href="javascript:void(0)">', "https://example.com/a") is None
+
+
+def test_unique_urls_keeps_the_first_variant_in_order():
+    urls = [["https://www.example.com/a/", "https://example.com/b"], ["http://example.com/a", "https://example.com/c"]]
+    assert unique_urls(urls) == ["https://www.example.com/a/", "https://example.com/b", "https://example.com/c"]
+
+
+def test_research_engine_returns_the_claimed_urls():
+    from src.research import ResearchEngine
+
+    engine = ResearchEngine([{"role": "user", "content": "question"}])
+    claimed = engine.claim_urls(["http://www.bls.gov/cps/", "https://bls.gov/cps", "https://example.com/a"])
+    assert claimed == ["http://www.bls.gov/cps/", "https://example.com/a"]
+    assert engine.results()["visited_urls"] == ["http://www.bls.gov/cps/", "https://example.com/a"]